@@ -0,0 +1,1065 @@
+import argparse
+import http.server
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import typing
+
+import proxy_league_helper as plh
+
+SYNTHETIC_SETS = (
+    ("lea", "core"),
+    ("m21", "core"),
+    ("neo", "expansion"),
+    ("mh2", "draft_innovation"),
+    ("cmr", "draft_innovation"),
+    ("c21", "commander"),
+    ("sld", "box"),
+    ("tneo", "token"),
+)
+SYNTHETIC_TYPE_LINES = (
+    "Creature — Human Wizard",
+    "Legendary Creature — Elf Druid",
+    "Instant",
+    "Sorcery",
+    "Artifact — Equipment",
+    "Enchantment — Aura",
+    "Legendary Planeswalker — Jace",
+    "Land",
+    "Basic Land — Forest",
+    "Token Creature — Spirit",
+)
+SYNTHETIC_COLOR_IDENTITIES = ("", "W", "U", "B", "R", "G", "WU", "UB", "BR", "RG", "GW")
+SYNTHETIC_FORMATS = (
+    "standard",
+    "future",
+    "historic",
+    "timeless",
+    "gladiator",
+    "pioneer",
+    "explorer",
+    "modern",
+    "legacy",
+    "pauper",
+    "vintage",
+    "penny",
+    "commander",
+    "oathbreaker",
+    "standardbrawl",
+    "brawl",
+    "alchemy",
+    "paupercommander",
+    "duel",
+    "oldschool",
+    "premodern",
+    "predh",
+)
+
+
+def synthetic_card(i: int, rng: random.Random) -> typing.Dict[str, typing.Any]:
+    set_id, set_type = rng.choice(SYNTHETIC_SETS)
+    type_line = rng.choice(SYNTHETIC_TYPE_LINES)
+    name = "Forest" if type_line.startswith("Basic") else f"Card {i // 4}"
+    oracle_text = " ".join(
+        rng.choice(("Flying", "{T}: Add {G}.", "Draw a card.", "(Reminder text.)"))
+        for _ in range(rng.randint(1, 12))
+    )
+    color_id = rng.choice(SYNTHETIC_COLOR_IDENTITIES)
+    image_base = f"https://cards.scryfall.io/{{}}/front/{i % 10}/{i % 7}/{i:08x}.jpg"
+    return {
+        "object": "card",
+        "id": f"{i:08x}-0000-0000-0000-000000000000",
+        "oracle_id": f"{i // 4:08x}-0000-0000-0000-000000000000",
+        "name": name,
+        "multiverse_ids": [i],
+        "lang": "en" if rng.random() < 0.8 else "ja",
+        "released_at": "2023-01-01",
+        "uri": f"https://api.scryfall.com/cards/{i:08x}",
+        "scryfall_uri": f"https://scryfall.com/card/{set_id}/{i}",
+        "layout": "normal",
+        "highres_image": True,
+        "image_status": "highres_scan",
+        "image_uris": {
+            size: image_base.format(size)
+            for size in ("small", "normal", "large", "png", "art_crop", "border_crop")
+        },
+        "mana_cost": "{2}{G}",
+        "cmc": 3.0,
+        "type_line": type_line,
+        "oracle_text": oracle_text,
+        "power": "2",
+        "toughness": "2",
+        "colors": list(color_id),
+        "color_identity": list(color_id),
+        "keywords": ["Flying"],
+        "legalities": {
+            fmt: rng.choice(("legal", "not_legal")) for fmt in SYNTHETIC_FORMATS
+        },
+        "games": ["paper", "mtgo"],
+        "reserved": False,
+        "foil": True,
+        "nonfoil": True,
+        "finishes": ["nonfoil", "foil"],
+        "oversized": False,
+        "promo": False,
+        "reprint": True,
+        "variation": False,
+        "set_id": f"{SYNTHETIC_SETS.index((set_id, set_type)):08x}-{'0' * 27}",
+        "set": set_id,
+        "set_name": set_id.upper(),
+        "set_type": set_type,
+        "set_uri": f"https://api.scryfall.com/sets/{set_id}",
+        "rulings_uri": f"https://api.scryfall.com/cards/{i:08x}/rulings",
+        "prints_search_uri": f"https://api.scryfall.com/cards/search?q={i}",
+        "collector_number": str(i),
+        "digital": False,
+        "rarity": rng.choice(("common", "uncommon", "rare", "mythic")),
+        "flavor_text": "It was a dark and stormy night." * rng.randint(0, 3),
+        "artist": "Synthetic Artist",
+        "artist_ids": ["00000000-0000-0000-0000-000000000000"],
+        "illustration_id": f"{i:08x}-1111-1111-1111-111111111111",
+        "border_color": "black",
+        "frame": "2015",
+        "full_art": False,
+        "textless": False,
+        "booster": True,
+        "story_spotlight": False,
+        "edhrec_rank": i,
+        "prices": {
+            "usd": f"{rng.random() ** 4 * 100:.2f}" if rng.random() < 0.9 else None,
+            "usd_foil": f"{rng.random() ** 4 * 200:.2f}",
+            "usd_etched": None,
+            "eur": f"{rng.random() ** 4 * 100:.2f}",
+            "eur_foil": None,
+            "tix": "0.03",
+        },
+        "related_uris": {
+            "gatherer": f"https://gatherer.wizards.com/Pages/Card/Details.aspx?multiverseid={i}",
+            "edhrec": f"https://edhrec.com/route/?cc=Card+{i}",
+        },
+        "purchase_uris": {
+            "tcgplayer": f"https://www.tcgplayer.com/product/{i}",
+            "cardmarket": f"https://www.cardmarket.com/en/Magic/Products/Search?{i}",
+            "cardhoarder": f"https://www.cardhoarder.com/cards/{i}",
+        },
+    }
+
+
+def write_synthetic_card_list(filepath: str, n_cards: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(filepath, "w", encoding="utf-8") as file:
+        file.write("[\n")
+        for i in range(n_cards):
+            if i:
+                file.write(",\n")
+            json.dump(synthetic_card(i, rng), file)
+        file.write("\n]\n")
+
+
+def measure(f: typing.Callable[[], typing.Any]) -> typing.Tuple[float, int]:
+    # tracemalloc slows down allocation-heavy code a lot, so time a separate run
+    start = time.perf_counter()
+    f()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        f()
+        return seconds, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def report(name: str, seconds: float, peak_bytes: int):
+    print(f"{name:>24}: {seconds:8.3f} s, {peak_bytes / (1 << 20):10.1f} MiB peak")
+
+
+def bench_parse(args: argparse.Namespace):
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = os.path.join(tmp, "cards.json")
+        write_synthetic_card_list(filepath, args.cards)
+        print(
+            f"synthetic card list: {args.cards} cards, "
+            f"{os.path.getsize(filepath) / (1 << 20):.1f} MiB"
+        )
+
+        def parse_whole():
+            plh.valid_cards = plh.valid_basics = plh.cards_by_rarity = None
+            with open(filepath, encoding="utf-8") as file:
+                plh.load_card_list(json.load(file))
+
+        def parse_streaming():
+            plh.valid_cards = plh.valid_basics = plh.cards_by_rarity = None
+            plh.load_card_list(plh.iter_card_list(filepath))
+
+        report("json.load", *measure(parse_whole))
+        report("iter_card_list", *measure(parse_streaming))
+
+
+def retained(f: typing.Callable[[], typing.Any]) -> typing.Tuple[typing.Any, int]:
+    tracemalloc.start()
+    try:
+        result = f()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_pool(args: argparse.Namespace):
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = os.path.join(tmp, "cards.json")
+        write_synthetic_card_list(filepath, args.cards)
+        plh.meld_results = (
+            plh.valid_cards
+        ) = plh.valid_basics = plh.cards_by_rarity = None
+
+        # the card pool used to keep every full printing dict alive
+        def load_whole():
+            with open(filepath, encoding="utf-8") as file:
+                return json.load(file)
+
+        whole, whole_bytes = retained(load_whole)
+        del whole
+        print(f"{'full printings':>24}: {whole_bytes / (1 << 20):10.1f} MiB retained")
+
+        def load_pool():
+            plh.load_card_list(plh.iter_card_list(filepath))
+
+        _, pool_bytes = retained(load_pool)
+        print(f"{'slim card pool':>24}: {pool_bytes / (1 << 20):10.1f} MiB retained")
+
+
+def load_synthetic_pool(n_cards: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = os.path.join(tmp, "cards.json")
+        write_synthetic_card_list(filepath, n_cards)
+        plh.load_card_list(plh.iter_card_list(filepath))
+
+
+def legacy_deck_contents() -> typing.List[plh.CardData]:
+    # how make_deck picked cards before deck pools were indexed
+    color1 = random.choice(plh.COLORS)
+    color2 = random.choice(plh.COLORS)
+    color_id = "".join(sorted(set(color1 + color2)))
+    deck_valid_cards = [
+        c
+        for c in plh.valid_cards.values()
+        if "Land" not in c.supertypes()
+        and "Conspiracy" not in c.supertypes()
+        and "".join(sorted(c.color_id)) in color_id
+    ]
+    deck_valid_noncreature_cards = [
+        c for c in deck_valid_cards if "Creature" not in c.supertypes()
+    ]
+    deck_valid_creature_cards = [
+        c for c in deck_valid_cards if "Creature" in c.supertypes()
+    ]
+    pack = []
+    for rarity, creature in zip(plh.DECK_RARITIES, plh.DECK_CREATURE_NONCREATURE):
+        pool = deck_valid_cards
+        if creature is True:
+            pool = deck_valid_creature_cards
+        if creature is False:
+            pool = deck_valid_noncreature_cards
+        pack.append(random.choice([c for c in pool if c.new_rarity == rarity]))
+    return pack
+
+
+def bench_decks(args: argparse.Namespace):
+    load_synthetic_pool(args.cards)
+
+    def rate(name: str, f: typing.Callable[[], typing.Any]):
+        random.seed(0)
+        start = time.perf_counter()
+        for _ in range(args.decks):
+            f()
+        seconds = time.perf_counter() - start
+        print(f"{name:>24}: {args.decks / seconds:10.1f} decks/s")
+
+    rate("per-call filtering", legacy_deck_contents)
+    rate("make_deck", plh.make_deck)
+
+
+def bench_packs(args: argparse.Namespace):
+    load_synthetic_pool(args.cards)
+
+    start = time.perf_counter()
+    for _ in range(args.packs):
+        plh.make_pack()
+    print(f"{'make_pack loop':>24}: {time.perf_counter() - start:8.3f} s")
+
+    start = time.perf_counter()
+    plh.make_packs(args.packs, seed=0)
+    print(f"{'make_packs':>24}: {time.perf_counter() - start:8.3f} s")
+
+
+def bench_startup(args: argparse.Namespace):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import proxy_league_helper"],
+        cwd=plh.PLH_HOME,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports: typing.List[typing.Tuple[int, str]] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0 and name.strip() == "proxy_league_helper":
+            print(f"import proxy_league_helper: {int(cumulative) / 1000:.1f} ms")
+            break
+        elif depth == 0:
+            # children are listed before their parent; these belonged to site etc.
+            imports = []
+        elif depth == 1:
+            imports.append((int(cumulative), name.strip()))
+    for cumulative, name in sorted(imports, reverse=True)[:10]:
+        print(f"{name:>24}: {cumulative / 1000:8.1f} ms")
+
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, plh.__file__, "--time-startup"],
+        cwd=plh.PLH_HOME,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    print(result.stdout.strip())
+    print(f"Process wall time: {time.perf_counter() - start:.3f}s")
+
+
+def legacy_card_text(
+    i: int, card: plh.CardData, printing, face, face_data, image_filename: str
+) -> str:
+    # how cards were filled into their template before it was compiled
+    power = face_data.get("power", "")
+    if "Planeswalker" in card.supertypes(face):
+        power = face_data.get("loyalty", "")
+    if "Battle" in card.supertypes(face):
+        power = face_data.get("defense", "")
+    return (
+        (plh.CARD_FILE_HEADER + plh.CARD_TEMPLATE)
+        .replace("@NAME@", card.name(face))
+        .replace("@COST@", plh.mse_format_mana_cost(face_data.get("mana_cost", "")))
+        .replace(
+            "@SUPERTYPE@",
+            " ".join(
+                f"<word-list-type>{t}</word-list-type>" for t in card.supertypes(face)
+            ),
+        )
+        .replace(
+            "@SUBTYPE@",
+            " ".join(
+                f"<word-list-type>{t}</word-list-type>" for t in card.subtypes(face)
+            ),
+        )
+        .replace("@RARITY@", plh.MSE_RARITIES[card.new_rarity])
+        .replace("@POWER@", power)
+        .replace("@TOUGHNESS@", face_data.get("toughness", ""))
+        .replace("@ARTIST@", face_data.get("artist", printing.get("artist", "Unknown")))
+        .replace("@IMAGE@", image_filename)
+        .replace(
+            "@RULES@",
+            plh.mse_format_rules(card, face, face_data.get("oracle_text", "")),
+        )
+        .replace("@FLAVOR@", plh.mse_format_flavor(face_data.get("flavor_text", "")))
+        .replace("@INDEX@", str(i))
+    )
+
+
+def synthetic_set_faces(n_cards: int) -> typing.List[typing.Tuple]:
+    random.seed(0)
+    return [
+        (i, card, card.raw_data[n_printing], face, face_data)
+        for i, card in enumerate(
+            random.choices(list(plh.valid_cards.values()), k=n_cards)
+        )
+        for n_printing in card.english_printings[:1]
+        for face, face_data in plh.mse_slot_faces(
+            card, card.raw_data[n_printing], n_printing
+        )
+    ]
+
+
+def write_set_files(set_dir: str, faces: typing.List[typing.Tuple]):
+    with open(os.path.join(set_dir, "set"), "w", encoding="utf-8") as set_file:
+        set_file.write(plh.SET_TEMPLATE)
+        for face in faces:
+            filename = f"card {face[0]} {face[3] or 0}"
+            set_file.write(f"include_file: {filename}\n")
+            with open(os.path.join(set_dir, filename), "w", encoding="utf-8") as file:
+                file.write(plh.CARD_FILE_HEADER)
+                file.write(plh.mse_card_text(*face, ""))
+
+
+def bench_set_file(args: argparse.Namespace):
+    load_synthetic_pool(args.cards)
+    faces = synthetic_set_faces(args.set_cards)
+
+    def rate(name: str, f: typing.Callable[..., str]):
+        start = time.perf_counter()
+        for face in faces:
+            f(*face, "")
+        seconds = time.perf_counter() - start
+        print(f"{name:>24}: {len(faces) / seconds:10.1f} cards/s")
+
+    rate("str.replace chain", legacy_card_text)
+    rate("compiled template", plh.mse_card_text)
+
+    def write_files(set_dir: str):
+        write_set_files(set_dir, faces)
+
+    def write_inline(set_dir: str):
+        with open(
+            os.path.join(set_dir, "set"), "w", encoding="utf-8", buffering=1 << 20
+        ) as set_file:
+            set_file.write(plh.SET_TEMPLATE)
+            for face in faces:
+                set_file.write(plh.mse_card_text(*face, ""))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, write in (("file per card", write_files), ("inline", write_inline)):
+            set_dir = os.path.join(tmp, name.replace(" ", "-"))
+            os.mkdir(set_dir)
+            shutil.copy(plh.MSE_SET_SYMBOL_FILEPATH, set_dir)
+            start = time.perf_counter()
+            write(set_dir)
+            seconds = time.perf_counter() - start
+            print(f"{name:>24}: {seconds:8.3f} s, {len(os.listdir(set_dir))} files")
+            if not os.path.exists(args.mse_path):
+                continue
+            start = time.perf_counter()
+            subprocess.run(
+                [args.mse_path, "--cli", "--quiet", "--raw"],
+                input=f":load {os.path.join(set_dir, 'set')}\n:quit\n",
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            print(f"{'MSE load':>24}: {time.perf_counter() - start:8.3f} s")
+        if not os.path.exists(args.mse_path):
+            print(f"MSE not found at {args.mse_path}, skipping load times")
+
+
+def legacy_format_symbols(s: str) -> str:
+    # how symbols and rules text were formatted before the single-pass tokenizer
+    def symfmt(m: re.Match) -> str:
+        sym = m.group(1)
+        result = sym
+        if sym == "TK":
+            result = "D"
+        if sym == "CHAOS":
+            result = "A"
+        if sym == "P":
+            result = "H"
+        if re.match(r"[^/]+/P", sym) or re.match(r"[^/]+/[^/]+/P", sym):
+            result = f"H/{sym[:-2]}"
+        if re.match(r"\d\d+", sym):
+            result = f"[{sym}]"
+        return "{" + result + "}"
+
+    return re.sub(r"{([^}]*)}", symfmt, s)
+
+
+def legacy_format_rules(s: str, planeswalker: bool, saga: bool) -> str:
+    if not s:
+        return s
+    result = (
+        "<kw-0>"
+        + legacy_format_symbols(s)
+        .replace("\n", "\n\t\t")
+        .replace("{", "<sym>")
+        .replace("}", "</sym>")
+        .replace("(", "<i>(")
+        .replace(")", ")</i>")
+        + "</kw-0>"
+    )
+    if planeswalker:
+        result = re.sub(
+            r"\+(\d+|[XYZ]): ", lambda m: f"<sym>+{m.group(1)}</sym>: ", result
+        )
+        result = re.sub(
+            r"[\-−](\d+|[XYZ]): ", lambda m: f"<sym>-{m.group(1)}</sym>: ", result
+        )
+        result = re.sub(
+            r"=(\d+|[XYZ]): ", lambda m: f"<sym>={m.group(1)}</sym>: ", result
+        )
+        result = re.sub(r"0: ", lambda m: f"<sym>+0</sym>: ", result)
+    if saga:
+        result = re.sub(r"\b[IVX]+", lambda m: f"<no-sym>{m.group(0)}</no-sym>", result)
+    return result
+
+
+def bench_rules(args: argparse.Namespace):
+    # real oracle texts if a card list has been downloaded, synthetic ones if not
+    filepath = plh.CARDS_JSON_FILEPATH
+    tmp = None
+    if not os.path.exists(filepath):
+        tmp = tempfile.TemporaryDirectory()
+        filepath = os.path.join(tmp.name, "cards.json")
+        write_synthetic_card_list(filepath, args.rules_texts)
+    texts = {}
+    for printing in plh.iter_card_list(filepath):
+        for face_data in printing.get("card_faces", [printing]):
+            type_line = face_data.get("type_line", printing.get("type_line", ""))
+            texts[face_data.get("oracle_text", "")] = (
+                "Planeswalker" in type_line,
+                "Saga" in type_line,
+            )
+        if len(texts) >= args.rules_texts:
+            break
+    if tmp is not None:
+        tmp.cleanup()
+    faces = [(s, planeswalker, saga) for s, (planeswalker, saga) in texts.items()]
+    for face in faces:
+        assert plh.mse_rules_markup(*face) == legacy_format_rules(*face), face
+    print(f"{len(faces)} {'synthetic' if tmp else 'real'} oracle texts")
+
+    def rate(name: str, f: typing.Callable[[str, bool, bool], str], copies: int):
+        start = time.perf_counter()
+        for _ in range(copies):
+            for face in faces:
+                f(*face)
+        seconds = time.perf_counter() - start
+        print(f"{name:>24}: {copies * len(faces) / seconds:10.1f} texts/s")
+
+    # each text once, then again as if for every copy in a few boxes of packs
+    rate("regex passes", legacy_format_rules, 1)
+    rate("single pass", plh.mse_rules_markup.__wrapped__, 1)
+    plh.mse_rules_markup.cache_clear()
+    rate("regex passes, repeated", legacy_format_rules, 10)
+    rate("single pass, memoized", plh.mse_rules_markup, 10)
+
+
+class SlowImageHandler(http.server.BaseHTTPRequestHandler):
+    # a stand-in for Scryfall's image server: every request takes a while, and
+    # anything under /flaky/ fails twice before it works
+    latency = 0.2
+    requested: typing.List[str] = []
+
+    def do_GET(self):
+        self.requested.append(self.path)
+        time.sleep(self.latency)
+        if self.path.startswith("/flaky/"):
+            if self.requested.count(self.path) <= 2:
+                self.send_error(503)
+                return
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_fetch(args: argparse.Namespace):
+    SlowImageHandler.latency = args.fetch_latency
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SlowImageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    default_workers = plh.ART_FETCH_WORKERS
+    try:
+        for workers in (1, default_workers):
+            paths = [f"/art/{workers}/{i}.jpg" for i in range(args.fetch_urls)]
+            paths.append(f"/flaky/{workers}.jpg")
+            with tempfile.TemporaryDirectory() as tmp:
+                cache = plh.ArtCache(tmp)
+                plh.ART_FETCH_WORKERS = workers
+                start = time.perf_counter()
+                cache.prefetch(base + path for path in paths)
+                seconds = time.perf_counter() - start
+                for path in paths:
+                    assert cache.get(base + path) == path.encode(), path
+                cache.save()
+                # the cache worker processes open never goes to the network
+                offline = plh.ArtCache(tmp, clean=False, offline=True)
+                assert offline.fetch(f"{base}/art/offline.jpg") is None
+                assert offline.fetch(base + paths[0]) == paths[0].encode()
+            print(
+                f"{f'{workers} workers':>24}: {seconds:8.3f} s, "
+                f"{len(paths) / seconds:6.1f} images/s"
+            )
+    finally:
+        plh.ART_FETCH_WORKERS = default_workers
+        server.shutdown()
+    assert "/art/offline.jpg" not in SlowImageHandler.requested
+
+
+STUB_MSE = r"""
+import os
+import re
+import struct
+import sys
+import time
+import zlib
+
+DELAY = float(os.environ.get("STUB_MSE_DELAY", "0"))
+LOG = os.environ.get("STUB_MSE_LOG", "")
+FAULT = os.environ.get("STUB_MSE_FAULT", "")
+
+
+def log(event):
+    if LOG:
+        with open(LOG, "a") as log_file:
+            log_file.write(f"{os.getpid()} {event}\n")
+
+
+def fault():
+    # the fault file makes the next image export crash or hang, once
+    try:
+        with open(FAULT) as fault_file:
+            mode = fault_file.read()
+        os.remove(FAULT)
+    except OSError:
+        return
+    if mode == "crash":
+        sys.exit(1)
+    time.sleep(3600)
+
+
+def load(set_filepath):
+    set_dir = os.path.dirname(set_filepath)
+    cards = []
+    with open(set_filepath, encoding="utf-8") as set_file:
+        for line in set_file:
+            if line.startswith("include_file: "):
+                filepath = os.path.join(set_dir, line.split(": ", 1)[1].strip())
+                with open(filepath, encoding="utf-8") as card_file:
+                    cards.append(card_file.read().split("\n", 1)[1])
+            elif line == "card:\n":
+                cards.append(line)
+            elif line.startswith("\t") and cards:
+                cards[-1] += line
+    return cards
+
+
+def write_image(card, filepath):
+    # a flat colour that depends on everything about the card but its index
+    time.sleep(DELAY)
+    text = "".join(
+        line
+        for line in card.splitlines(True)
+        if not line.startswith(("\tindex: ", "\timage: "))
+    )
+    color = zlib.crc32(text.encode("utf-8")).to_bytes(4, "big")[:3]
+    width, height = 75, 105
+    data = zlib.compress((b"\0" + color * width) * height)
+
+    def chunk(kind, body):
+        crc = struct.pack(">I", zlib.crc32(kind + body))
+        return struct.pack(">I", len(body)) + kind + body + crc
+
+    with open(filepath, "wb") as image_file:
+        image_file.write(b"\x89PNG\r\n\x1a\n")
+        image_file.write(
+            chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        )
+        image_file.write(chunk(b"IDAT", data))
+        image_file.write(chunk(b"IEND", b""))
+
+
+log("start")
+if sys.argv[1] == "--export-images":
+    used = set()
+    for card in load(sys.argv[2]):
+        index = re.search(r"^\tindex: (.*)$", card, re.MULTILINE).group(1)
+        filepath = sys.argv[3].replace("{card.index}", index)
+        base, ext = os.path.splitext(filepath)
+        n = 0
+        while filepath in used:
+            n += 1
+            filepath = f"{base}.{n}{ext}"
+        used.add(filepath)
+        write_image(card, filepath)
+elif sys.argv[1:] == ["--cli", "--quiet", "--raw"]:
+    cards = []
+    for line in sys.stdin:
+        line = line.rstrip("\n")
+        match = re.match(r'write_image_file\(set\.cards\[(\d+)\], file: "(.*)"\)$', line)
+        if line.startswith(":load "):
+            cards = load(line[len(":load ") :])
+        elif line == ":quit":
+            log("quit")
+            break
+        elif line.startswith('"'):
+            print(line.strip('"'), flush=True)
+        elif match:
+            fault()
+            write_image(cards[int(match.group(1))], match.group(2))
+"""
+
+
+def write_stub_mse(directory: str) -> str:
+    # a stand-in for MSE that runs anywhere Python does (given a #! line), drawing
+    # each card as a small PNG after a delay, either with --export-images or as a
+    # --cli --raw process
+    filepath = os.path.join(directory, "stub-mse")
+    with open(filepath, "w", encoding="utf-8") as file:
+        file.write(f"#!{sys.executable}\n{STUB_MSE}")
+    os.chmod(filepath, 0o755)
+    return filepath
+
+
+def write_stub_set(set_dir: str, faces: typing.List[typing.Tuple]):
+    os.makedirs(set_dir)
+    shutil.copy(plh.MSE_SET_SYMBOL_FILEPATH, set_dir)
+    write_set_files(set_dir, faces)
+
+
+def exported_images(set_dir: str) -> typing.Dict[str, bytes]:
+    images = {}
+    for filename in os.listdir(set_dir):
+        if filename.endswith(".png"):
+            with open(os.path.join(set_dir, filename), "rb") as file:
+                images[filename] = file.read()
+    return images
+
+
+def bench_export(args: argparse.Namespace):
+    load_synthetic_pool(args.cards)
+    faces = synthetic_set_faces(args.export_cards)
+    os.environ["STUB_MSE_DELAY"] = str(args.stub_mse_delay)
+    with tempfile.TemporaryDirectory() as tmp:
+        mse_path = write_stub_mse(tmp)
+        results = {}
+        for shards in (1, args.export_shards):
+            set_dir = os.path.join(tmp, f"{shards}.mse-set")
+            write_stub_set(set_dir, faces)
+            start = time.perf_counter()
+            plh.mse_export_set(set_dir, shards, shards, mse_path)
+            seconds = time.perf_counter() - start
+            results[shards] = exported_images(set_dir)
+            assert not os.path.exists(os.path.join(set_dir, plh.MSE_SHARDS_DIRNAME))
+            print(f"{f'{shards} shards':>24}: {seconds:8.3f} s")
+        assert len(results[1]) == len(faces)
+        assert results[args.export_shards] == results[1]
+
+
+def bench_workers(args: argparse.Namespace):
+    load_synthetic_pool(args.cards)
+    faces = synthetic_set_faces(args.worker_cards)
+    timeouts = plh.MSE_CLI_TIMEOUT, plh.MSE_CLI_TIMEOUT_PER_CARD
+    plh.MSE_CLI_TIMEOUT, plh.MSE_CLI_TIMEOUT_PER_CARD = 2, 0.1
+    with tempfile.TemporaryDirectory() as tmp:
+        mse_path = write_stub_mse(tmp)
+        log_filepath = os.path.join(tmp, "log")
+        fault_filepath = os.path.join(tmp, "fault")
+        os.environ["STUB_MSE_DELAY"] = str(args.stub_mse_delay)
+        os.environ["STUB_MSE_LOG"] = log_filepath
+        os.environ["STUB_MSE_FAULT"] = fault_filepath
+
+        def events() -> typing.List[str]:
+            with open(log_filepath, encoding="utf-8") as log_file:
+                return [line.split()[1] for line in log_file]
+
+        # the same worker is reused until it crashes or hangs, then replaced, and
+        # the export that hit the fault still finishes
+        try:
+            for name, fault in (
+                ("cold", None),
+                ("warm", None),
+                ("crash", "crash"),
+                ("hang", "hang"),
+                ("after", None),
+            ):
+                set_dir = os.path.join(tmp, f"{name}.mse-set")
+                write_stub_set(set_dir, faces)
+                if fault:
+                    with open(fault_filepath, "w", encoding="utf-8") as fault_file:
+                        fault_file.write(fault)
+                start = time.perf_counter()
+                plh.mse_export_images(set_dir, plh.MSECLIWorker, mse_path)
+                seconds = time.perf_counter() - start
+                assert len(exported_images(set_dir)) == len(faces), name
+                print(f"{name:>24}: {seconds:8.3f} s")
+            assert events() == ["start"] * 3, events()
+            plh.close_mse_workers()
+            assert events() == ["start"] * 3 + ["quit"], events()
+        finally:
+            plh.MSE_CLI_TIMEOUT, plh.MSE_CLI_TIMEOUT_PER_CARD = timeouts
+            plh.close_mse_workers()
+
+        # and a worker left running is told to quit when Python exits
+        set_dir = os.path.join(tmp, "atexit.mse-set")
+        write_stub_set(set_dir, faces)
+        subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, proxy_league_helper as plh; "
+                "plh.mse_export_images(sys.argv[1], plh.MSECLIWorker, sys.argv[2])",
+                set_dir,
+                mse_path,
+            ],
+            cwd=os.path.dirname(os.path.abspath(plh.__file__)),
+            check=True,
+        )
+        assert len(exported_images(set_dir)) == len(faces)
+        assert events()[-2:] == ["start", "quit"], events()
+        del os.environ["STUB_MSE_LOG"], os.environ["STUB_MSE_FAULT"]
+
+
+def bench_renders(args: argparse.Namespace):
+    load_synthetic_pool(args.cards)
+    faces = synthetic_set_faces(args.export_cards)
+    with tempfile.TemporaryDirectory() as tmp:
+        mse_path = write_stub_mse(tmp)
+        log_filepath = os.path.join(tmp, "log")
+        os.environ["STUB_MSE_DELAY"] = str(args.stub_mse_delay)
+        os.environ["STUB_MSE_LOG"] = log_filepath
+        plh.render_cache = plh.RenderCache(os.path.join(tmp, "render_cache"))
+
+        def snapshot(set_dir: str) -> typing.Dict[str, typing.Tuple[int, int]]:
+            return {
+                filename: (stat.st_ino, stat.st_mtime_ns)
+                for filename in os.listdir(set_dir)
+                if filename.endswith(".png")
+                for stat in [os.stat(os.path.join(set_dir, filename))]
+            }
+
+        def n_started() -> int:
+            with open(log_filepath, encoding="utf-8") as log_file:
+                return len(log_file.readlines())
+
+        # the second call finds everything already rendered and padded, and the
+        # same set somewhere else gets everything from the render cache
+        set_dir = os.path.join(tmp, "set.mse-set")
+        write_stub_set(set_dir, faces)
+        for name in ("cold", "again"):
+            before = snapshot(set_dir)
+            start = time.perf_counter()
+            images = plh.mse_gen_card_images(set_dir, mse_path=mse_path)
+            print(f"{name:>24}: {time.perf_counter() - start:8.3f} s")
+        assert len(images) == len(faces)
+        assert snapshot(set_dir) == before
+        assert n_started() == 1
+
+        copy_dir = os.path.join(tmp, "copy.mse-set")
+        write_stub_set(copy_dir, faces)
+        start = time.perf_counter()
+        copy_images = plh.mse_gen_card_images(copy_dir, mse_path=mse_path)
+        print(f"{'render cache':>24}: {time.perf_counter() - start:8.3f} s")
+        assert n_started() == 1
+        assert exported_images(copy_dir) == exported_images(set_dir)
+        assert len(copy_images) == len(faces)
+        print(plh.render_cache.stats())
+        plh.render_cache = None
+        del os.environ["STUB_MSE_LOG"]
+
+
+class BulkDataHandler(http.server.BaseHTTPRequestHandler):
+    # a stand-in for Scryfall's bulk data API and the file it points to, which can
+    # be cut off partway through a download
+    body = b""
+    updated_at = ""
+    cut_at: typing.Union[int, None] = None
+    ranges: typing.List[typing.Union[str, None]] = []
+
+    def do_GET(self):
+        if self.path == "/bulk-data":
+            bulk_desc = {
+                "data": [
+                    {
+                        "type": "default_cards",
+                        "updated_at": self.updated_at,
+                        "size": len(self.body),
+                        "download_uri": f"http://{self.headers['Host']}/cards.json",
+                    }
+                ]
+            }
+            body = json.dumps(bulk_desc).encode()
+            self.send_response(200)
+        else:
+            self.ranges.append(self.headers.get("Range"))
+            start = 0
+            if self.headers.get("Range"):
+                start = int(self.headers["Range"][len("bytes=") : -len("-")])
+                if start >= len(self.body):
+                    self.send_error(416)
+                    return
+                self.send_response(206)
+            else:
+                self.send_response(200)
+            body = self.body[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body[: self.cut_at])
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_download(args: argparse.Namespace):
+    import requests
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), BulkDataHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    bulk_data_url = f"http://127.0.0.1:{server.server_address[1]}/bulk-data"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            filepath = os.path.join(tmp, "cards.json")
+            write_synthetic_card_list(filepath, args.download_cards)
+            with open(filepath, "rb") as file:
+                BulkDataHandler.body = file.read()
+            os.remove(filepath)
+
+            def download(name: str) -> bool:
+                start = time.perf_counter()
+                downloaded = plh.download_card_list(bulk_data_url, filepath)
+                print(f"{name:>24}: {time.perf_counter() - start:8.3f} s")
+                return downloaded
+
+            def check():
+                with open(filepath, "rb") as file:
+                    assert file.read() == BulkDataHandler.body
+                assert sorted(os.listdir(tmp)) == ["cards.json", "cards.json.meta"]
+
+            BulkDataHandler.updated_at = "2024-01-01T00:00:00+00:00"
+            assert download("fresh")
+            check()
+            assert BulkDataHandler.ranges == [None]
+
+            # nothing new on the server, so the file isn't even requested
+            assert not download("unchanged")
+            assert BulkDataHandler.ranges == [None]
+
+            # an update cut off halfway is picked up where it stopped
+            BulkDataHandler.updated_at = "2024-01-02T00:00:00+00:00"
+            BulkDataHandler.cut_at = len(BulkDataHandler.body) // 2
+            try:
+                plh.download_card_list(bulk_data_url, filepath)
+            except requests.RequestException:
+                pass
+            else:
+                raise AssertionError("the cut off download didn't fail")
+            part_size = os.path.getsize(filepath + ".part")
+            assert 0 < part_size <= BulkDataHandler.cut_at
+            BulkDataHandler.cut_at = None
+            assert download("resumed")
+            check()
+            assert BulkDataHandler.ranges[-1] == f"bytes={part_size}-"
+
+            # and one that was cut off just before it was moved into place
+            BulkDataHandler.updated_at = "2024-01-03T00:00:00+00:00"
+            os.rename(filepath, filepath + ".part")
+            with open(filepath + ".part.meta", "w", encoding="utf-8") as file:
+                json.dump(
+                    {
+                        "updated_at": BulkDataHandler.updated_at,
+                        "size": len(BulkDataHandler.body),
+                        "download_uri": bulk_data_url.replace(
+                            "bulk-data", "cards.json"
+                        ),
+                    },
+                    file,
+                )
+            assert download("already complete")
+            check()
+            assert BulkDataHandler.ranges[-1] == f"bytes={len(BulkDataHandler.body)}-"
+    finally:
+        server.shutdown()
+
+
+BENCHMARKS = {
+    "parse": bench_parse,
+    "pool": bench_pool,
+    "decks": bench_decks,
+    "packs": bench_packs,
+    "startup": bench_startup,
+    "setfile": bench_set_file,
+    "rules": bench_rules,
+    "fetch": bench_fetch,
+    "export": bench_export,
+    "workers": bench_workers,
+    "renders": bench_renders,
+    "download": bench_download,
+}
+
+
+def main(argv: typing.List[str]) -> int:
+    parser = argparse.ArgumentParser(
+        argv[0], description="benchmarks for Proxy League Helper"
+    )
+    parser.add_argument(
+        "benchmarks", nargs="*", help=f"benchmarks to run ({', '.join(BENCHMARKS)})"
+    )
+    parser.add_argument(
+        "--cards", type=int, default=100000, help="size of synthetic card lists"
+    )
+    parser.add_argument(
+        "--download-cards",
+        type=int,
+        default=5000,
+        help="size of the card list downloaded from a local server",
+    )
+    parser.add_argument(
+        "--decks", type=int, default=200, help="number of starter decks to make"
+    )
+    parser.add_argument(
+        "--packs", type=int, default=10000, help="number of booster packs to make"
+    )
+    parser.add_argument(
+        "--set-cards", type=int, default=5000, help="number of cards in MSE sets"
+    )
+    parser.add_argument(
+        "--rules-texts",
+        type=int,
+        default=5000,
+        help="number of distinct oracle texts to format",
+    )
+    parser.add_argument(
+        "--fetch-urls", type=int, default=40, help="number of art URLs to fetch"
+    )
+    parser.add_argument(
+        "--fetch-latency",
+        type=float,
+        default=0.2,
+        help="seconds the local image server takes per request",
+    )
+    parser.add_argument(
+        "--export-cards",
+        type=int,
+        default=200,
+        help="number of cards in sets exported with the stand-in MSE",
+    )
+    parser.add_argument(
+        "--worker-cards",
+        type=int,
+        default=20,
+        help="number of cards in sets exported by MSE --cli workers",
+    )
+    parser.add_argument(
+        "--export-shards", type=int, default=4, help="shards to export sets in"
+    )
+    parser.add_argument(
+        "--stub-mse-delay",
+        type=float,
+        default=0.02,
+        help="seconds the stand-in MSE takes per card",
+    )
+    parser.add_argument(
+        "--mse-path", default=plh.MSE_PATH, help="MSE to time loading sets with"
+    )
+    args = parser.parse_args(argv[1:])
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+    for name in args.benchmarks or BENCHMARKS:
+        print(f"== {name} ==")
+        BENCHMARKS[name](args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
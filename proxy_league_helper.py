@@ -1,19 +1,30 @@
 import argparse
+import atexit
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
 import io
+import itertools
 import json
 import math
 import os
+import pickle
+import queue
 import random
 import re
 import shutil
+import struct
 import subprocess
 import sys
+import threading
+import time
 import typing
-import xml.etree.ElementTree as xml
+import zipfile
+import zlib
 
-import consolemenu
-import PIL.Image
-import requests
+if typing.TYPE_CHECKING:
+    import PIL.Image
 
 PLH_HOME = os.path.dirname(__file__)
 
@@ -91,15 +102,126 @@ BASIC_LAND_TO_COLOR = {
 BASIC_LANDS = set(BASIC_LAND_TO_COLOR.keys())
 
 
+PRINTING_FIELDS = (
+    "id",
+    "name",
+    "lang",
+    "layout",
+    "rarity",
+    "mana_cost",
+    "type_line",
+    "oracle_text",
+    "flavor_text",
+    "power",
+    "toughness",
+    "loyalty",
+    "defense",
+    "color_indicator",
+    "artist",
+    "image_uris",
+    "card_faces",
+    "all_parts",
+)
+INTERNED_PRINTING_FIELDS = ("lang", "layout", "rarity", "type_line", "artist")
+
+
+def trim_printing(card: typing.Dict[str, typing.Any]) -> typing.Dict[str, typing.Any]:
+    printing = {}
+    for field in PRINTING_FIELDS:
+        if field not in card:
+            continue
+        value = card[field]
+        if field in INTERNED_PRINTING_FIELDS and isinstance(value, str):
+            value = sys.intern(value)
+        elif field == "image_uris":
+            value = {"art_crop": value["art_crop"]} if "art_crop" in value else {}
+        elif field == "card_faces":
+            value = [trim_printing(face) for face in value]
+        elif field == "all_parts":
+            value = [
+                {"component": part["component"], "id": part["id"]}
+                for part in value
+                if part["component"] == "meld_result"
+            ]
+        printing[field] = value
+    return printing
+
+
+def split_typeline(
+    typeline: str,
+) -> typing.Tuple[typing.List[str], typing.List[str]]:
+    types = typeline.split(" ")
+
+    try:
+        dash = types.index("—")
+    except ValueError:
+        return types, []
+    return types[:dash], types[dash + 1 :]
+
+
 class CardData:
-    prices: typing.List[float]
+    __slots__ = (
+        "oracle_id",
+        "color_id",
+        "price",
+        "new_rarity",
+        "raw_data",
+        "is_dfc",
+        "needs_snow",
+        "needs_colorless",
+        "english_printings",
+        "_types",
+    )
+
+    oracle_id: str
+    color_id: str
+    price: float
     new_rarity: int
     raw_data: typing.List[typing.Dict[str, typing.Any]]
+    is_dfc: bool
+    needs_snow: bool
+    needs_colorless: bool
+    english_printings: typing.List[int]
+    _types: typing.Dict[
+        typing.Union[int, None], typing.Tuple[typing.List[str], typing.List[str]]
+    ]
 
-    def __init__(self) -> None:
-        self.prices = []
+    def __init__(self, oracle_id: str, color_id: str) -> None:
+        self.oracle_id = oracle_id
+        self.color_id = sys.intern(color_id)
+        self.price = math.inf
         self.new_rarity = -1
         self.raw_data = []
+        self.is_dfc = False
+        self.needs_snow = False
+        self.needs_colorless = False
+        self.english_printings = []
+        self._types = {}
+
+    def precompute(self):
+        self.is_dfc = any(
+            ("card_faces" in printing and len(printing["card_faces"]) > 1)
+            or printing["layout"] == "meld"
+            for printing in self.raw_data
+        )
+        self.needs_snow = any(
+            (card.get("mana_cost") and "{S}" in card["mana_cost"])
+            or (card.get("oracle_text") and "{S}" in card["oracle_text"])
+            for card in self.raw_data
+        )
+        self.needs_colorless = any(
+            card.get("mana_cost") and "{C}" in card["mana_cost"]
+            for card in self.raw_data
+        )
+        self.english_printings = [
+            i for i, printing in enumerate(self.raw_data) if printing["lang"] == "en"
+        ]
+        self._types = {}
+        for face in (None, 0, 1) if self.is_dfc else (None,):
+            try:
+                self._types[face] = split_typeline(self.typeline(face))
+            except (KeyError, IndexError, StopIteration):
+                pass
 
     @property
     def printings(self):
@@ -111,55 +233,19 @@ class CardData:
     def typeline(self, face=None) -> str:
         return self.face(face)["type_line"]
 
-    @property
-    def color_id(self) -> str:
-        return "".join(self.raw_data[0]["color_identity"])
-
     @property
     def old_rarities(self) -> typing.Set[str]:
         return set(c["rarity"] for c in self.raw_data if c.get("rarity"))
 
-    @property
-    def needs_snow(self) -> bool:
-        return any(
-            (card.get("mana_cost") and "{S}" in card["mana_cost"])
-            or (card.get("oracle_text") and "{S}" in card["oracle_text"])
-            for card in self.raw_data
-        )
-
-    @property
-    def needs_colorless(self) -> bool:
-        return any(
-            card.get("mana_cost") and "{C}" in card["mana_cost"]
-            for card in self.raw_data
-        )
-
     def supertypes(self, face=None) -> typing.List[str]:
-        types = self.typeline(face).split(" ")
-
-        try:
-            dash = types.index("—")
-        except ValueError:
-            return types
-
-        return types[:dash]
+        if face in self._types:
+            return self._types[face][0]
+        return split_typeline(self.typeline(face))[0]
 
     def subtypes(self, face=None) -> typing.List[str]:
-        types = self.typeline(face).split(" ")
-
-        try:
-            dash = types.index("—")
-        except ValueError:
-            return []
-        return types[dash + 1 :]
-
-    @property
-    def is_dfc(self):
-        return any(
-            ("card_faces" in printing and len(printing["card_faces"]) > 1)
-            or printing["layout"] == "meld"
-            for printing in self.raw_data
-        )
+        if face in self._types:
+            return self._types[face][1]
+        return split_typeline(self.typeline(face))[1]
 
     def face(
         self, face: typing.Union[int, None], n_printing: int = 0
@@ -173,7 +259,7 @@ class CardData:
                     p for p in printing["all_parts"] if p["component"] == "meld_result"
                 )
             )
-            return next(iter(c for c in cards if c["id"] == part["id"]))
+            return meld_results[part["id"]]
         else:
             return printing["card_faces"][face]
 
@@ -186,79 +272,299 @@ BRACKETS = (0.25, 4.00, 40.00, math.inf)
 BRACKET_NAMES = ("common", "uncommon", "rare", "mythic")
 OLD_RARITIES = ("common", "uncommon", "rare", "mythic", "special")
 
-cards: typing.List[typing.Dict[str, typing.Any]]
+meld_results: typing.Dict[str, typing.Dict[str, typing.Any]]
 valid_cards: typing.Dict[str, CardData]
 valid_basics: typing.Dict[str, typing.List[typing.Dict[str, typing.Any]]]
 cards_by_rarity: typing.List[typing.List[CardData]]
+cards_by_name: typing.Dict[str, CardData]
+card_name_trigrams: typing.Dict[str, typing.List[str]]
+deck_card_pool: typing.List[CardData]
+deck_pools: typing.Dict[
+    typing.Tuple[int, typing.Union[bool, None], int], typing.List[CardData]
+]
 
 CARDS_JSON_FILEPATH = os.path.join(PLH_HOME, "cards.json")
+CARDS_SNAPSHOT_FILEPATH = os.path.join(PLH_HOME, "cards.snapshot")
+# bump this whenever the layout of CardData or the snapshot changes
+CARDS_SNAPSHOT_VERSION = 5
 
 
-def download_card_list():
-    response = requests.get("https://api.scryfall.com/bulk-data")
+SCRYFALL_BULK_DATA_URL = "https://api.scryfall.com/bulk-data"
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+
+def read_json_file(filepath: str) -> typing.Any:
+    try:
+        with open(filepath, encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json_file(filepath: str, data: typing.Any):
+    temp_filepath = filepath + ".tmp"
+    with open(temp_filepath, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(temp_filepath, filepath)
+
+
+def download_card_list(
+    bulk_data_url: str = SCRYFALL_BULK_DATA_URL, filepath: str = CARDS_JSON_FILEPATH
+) -> bool:
+    import requests
+
+    response = requests.get(bulk_data_url)
     if not response.ok:
         response.raise_for_status()
     bulk_desc = json.loads(response.text)
     bulk_category = [b for b in bulk_desc["data"] if b["type"] == "default_cards"][0]
 
-    response = requests.get(bulk_category["download_uri"])
-    if not response.ok:
-        response.raise_for_status()
-    with open(CARDS_JSON_FILEPATH, "w", encoding="utf-8") as file:
-        file.write(response.text)
-
+    bulk_meta = {
+        "updated_at": bulk_category["updated_at"],
+        "size": bulk_category["size"],
+        "download_uri": bulk_category["download_uri"],
+    }
+    meta_filepath = filepath + ".meta"
+    if os.path.exists(filepath) and read_json_file(meta_filepath) == bulk_meta:
+        return False
+
+    # resume a partial download of this same file, if there is one
+    part_filepath = filepath + ".part"
+    part_meta_filepath = part_filepath + ".meta"
+    headers = {"Accept-Encoding": "gzip"}
+    if (
+        os.path.exists(part_filepath)
+        and read_json_file(part_meta_filepath) == bulk_meta
+    ):
+        # ranges are over the identity encoding, which is what the .part file holds
+        headers = {
+            "Accept-Encoding": "identity",
+            "Range": f"bytes={os.path.getsize(part_filepath)}-",
+        }
+    else:
+        write_json_file(part_meta_filepath, bulk_meta)
+
+    with requests.get(
+        bulk_category["download_uri"], headers=headers, stream=True
+    ) as response:
+        # 416 means the .part file is already complete
+        if response.status_code != 416:
+            if not response.ok:
+                response.raise_for_status()
+            mode = "ab" if response.status_code == 206 else "wb"
+            with open(part_filepath, mode) as file:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    file.write(chunk)
+
+    os.replace(part_filepath, filepath)
+    write_json_file(meta_filepath, bulk_meta)
+    os.remove(part_meta_filepath)
+    return True
+
+
+CARDS_JSON_CHUNK_SIZE = 1 << 20
+
+
+def iter_card_list(
+    filepath: str = CARDS_JSON_FILEPATH,
+) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    decoder = json.JSONDecoder()
+    with open(filepath, encoding="utf-8") as input_file:
+        buffer = ""
+        pos = 0
+        started = False
+        error: typing.Union[json.JSONDecodeError, None] = None
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer):
+                if not started:
+                    if buffer[pos] != "[":
+                        raise ValueError(f"{filepath}: card list is not a JSON array")
+                    started = True
+                    pos += 1
+                    continue
+                if buffer[pos] == "]":
+                    return
+                try:
+                    card, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    # probably an object cut off at the end of the buffer; read more
+                    error = e
+                else:
+                    yield card
+                    continue
+            chunk = input_file.read(CARDS_JSON_CHUNK_SIZE)
+            if not chunk:
+                if error:
+                    raise error
+                raise ValueError(f"{filepath}: unexpected end of card list")
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            error = None
+
+
+def card_prices(card: typing.Dict[str, typing.Any]) -> typing.List[float]:
+    prices: typing.List[float] = []
+    if "prices" in card and card["prices"]:
+        if "usd" in card["prices"] and card["prices"]["usd"]:
+            prices.append(float(card["prices"]["usd"]))
+        if "usd_foil" in card["prices"] and card["prices"]["usd_foil"]:
+            prices.append(float(card["prices"]["usd_foil"]))
+        if "usd_etched" in card["prices"] and card["prices"]["usd_etched"]:
+            prices.append(float(card["prices"]["usd_etched"]))
+        if "eur" in card["prices"] and card["prices"]["eur"]:
+            prices.append(float(card["prices"]["eur"]) * EUR_TO_USD)
+        if "eur_foil" in card["prices"] and card["prices"]["eur_foil"]:
+            prices.append(float(card["prices"]["eur_foil"]) * EUR_TO_USD)
+        if "eur_etched" in card["prices"] and card["prices"]["eur_etched"]:
+            prices.append(float(card["prices"]["eur_etched"]) * EUR_TO_USD)
+    return prices
+
+
+def is_valid_card(card: typing.Dict[str, typing.Any], prices: typing.List[float]):
+    types = card.get("type_line", "").split(" ")
+    return (
+        len(prices) > 0
+        and any((t in types) for t in VALID_TYPES)
+        and not any((t in types) for t in INVALID_TYPES)
+        and card["set_type"] not in INVALID_SET_TYPES
+        and not card["oversized"]
+        and not all(legality == "not_legal" for legality in card["legalities"].values())
+        and card["set"] not in INVALID_SET_IDS
+        and "playing for ante" not in card.get("oracle_text", "")
+    )
 
-def parse_card_list():
-    global cards, valid_cards, valid_basics, cards_by_rarity
 
+def parse_card_list() -> bool:
     if not os.path.exists(CARDS_JSON_FILEPATH):
         download_card_list()
 
-    with open(CARDS_JSON_FILEPATH, encoding="utf-8") as input_file:
-        cards = json.load(input_file)
+    key = card_list_snapshot_key(CARDS_JSON_FILEPATH)
+    if load_card_list_snapshot(CARDS_SNAPSHOT_FILEPATH, CARDS_JSON_FILEPATH, key):
+        return True
+    load_card_list(iter_card_list(CARDS_JSON_FILEPATH))
+    save_card_list_snapshot(CARDS_SNAPSHOT_FILEPATH, CARDS_JSON_FILEPATH, key)
+    return False
+
+
+def card_list_snapshot_key(filepath: str) -> typing.Dict[str, typing.Any]:
+    stat = os.stat(filepath)
+    return {
+        "version": CARDS_SNAPSHOT_VERSION,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "filters": (
+            BRACKETS,
+            EUR_TO_USD,
+            VALID_TYPES,
+            INVALID_TYPES,
+            INVALID_SET_TYPES,
+            INVALID_SET_IDS,
+        ),
+    }
+
+
+def file_sha256(filepath: str) -> str:
+    sha = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        for chunk in iter(lambda: file.read(CARDS_JSON_CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def load_card_list_snapshot(
+    filepath: str, json_filepath: str, key: typing.Dict[str, typing.Any]
+) -> bool:
+    global meld_results, valid_cards, valid_basics, cards_by_rarity
+
+    if not os.path.exists(filepath):
+        return False
+    try:
+        with open(filepath, "rb") as snapshot_file:
+            snapshot_key = pickle.load(snapshot_file)
+            snapshot_hash = snapshot_key.pop("sha256", None)
+            if snapshot_key != key or snapshot_hash != file_sha256(json_filepath):
+                return False
+            meld_results, cards, valid_basics, oracle_ids_by_rarity = pickle.load(
+                snapshot_file
+            )
+        valid_cards = {}
+        for state in cards:
+            card = CardData.__new__(CardData)
+            for slot, value in zip(CardData.__slots__, state):
+                setattr(card, slot, value)
+            valid_cards[card.oracle_id] = card
+        cards_by_rarity = [
+            [valid_cards[oracle_id] for oracle_id in oracle_ids]
+            for oracle_ids in oracle_ids_by_rarity
+        ]
+    except Exception:
+        return False
+    index_card_pool()
+    return True
+
+
+def save_card_list_snapshot(
+    filepath: str, json_filepath: str, key: typing.Dict[str, typing.Any]
+):
+    key = {**key, "sha256": file_sha256(json_filepath)}
+    # plain data only; pickled CardData is tied to the module's name
+    cards = [
+        tuple(getattr(card, slot) for slot in CardData.__slots__)
+        for card in valid_cards.values()
+    ]
+    oracle_ids_by_rarity = [
+        [card.oracle_id for card in rarity_cards] for rarity_cards in cards_by_rarity
+    ]
+    temp_filepath = filepath + ".tmp"
+    try:
+        with open(temp_filepath, "wb") as snapshot_file:
+            pickle.dump(key, snapshot_file, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(
+                (meld_results, cards, valid_basics, oracle_ids_by_rarity),
+                snapshot_file,
+                pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(temp_filepath, filepath)
+    except OSError:
+        pass
+
 
+def load_card_list(card_list: typing.Iterable[typing.Dict[str, typing.Any]]):
+    global meld_results, valid_cards, valid_basics, cards_by_rarity
+
+    meld_cards: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
     valid_cards = {}
     valid_basics = {}
-    for card in cards:
+    for card in card_list:
+        if card.get("layout") == "meld":
+            meld_cards[card["id"]] = trim_printing(card)
         if card["name"] in BASIC_LANDS:
             if card["set"] not in INVALID_SET_IDS and card["lang"] == "en":
                 valid_basics.setdefault(card["name"], [])
-                valid_basics[card["name"]].append(card)
+                valid_basics[card["name"]].append(trim_printing(card))
             continue
-        types = card.get("type_line", "").split(" ")
-        prices: typing.List[float] = []
-        if "prices" in card and card["prices"]:
-            if "usd" in card["prices"] and card["prices"]["usd"]:
-                prices.append(float(card["prices"]["usd"]))
-            if "usd_foil" in card["prices"] and card["prices"]["usd_foil"]:
-                prices.append(float(card["prices"]["usd_foil"]))
-            if "usd_etched" in card["prices"] and card["prices"]["usd_etched"]:
-                prices.append(float(card["prices"]["usd_etched"]))
-            if "eur" in card["prices"] and card["prices"]["eur"]:
-                prices.append(float(card["prices"]["eur"]) * EUR_TO_USD)
-            if "eur_foil" in card["prices"] and card["prices"]["eur_foil"]:
-                prices.append(float(card["prices"]["eur_foil"]) * EUR_TO_USD)
-            if "eur_etched" in card["prices"] and card["prices"]["eur_etched"]:
-                prices.append(float(card["prices"]["eur_etched"]) * EUR_TO_USD)
-        if (
-            len(prices) > 0
-            and any((t in types) for t in VALID_TYPES)
-            and not any((t in types) for t in INVALID_TYPES)
-            and card["set_type"] not in INVALID_SET_TYPES
-            and not card["oversized"]
-            and not all(
-                legality == "not_legal" for legality in card["legalities"].values()
-            )
-            and card["set"] not in INVALID_SET_IDS
-            and "playing for ante" not in card.get("oracle_text", "")
-        ):
+        prices = card_prices(card)
+        if is_valid_card(card, prices):
             valid_cards.setdefault(
                 card["oracle_id"],
-                CardData(),
+                CardData(card["oracle_id"], "".join(card["color_identity"])),
             )
             card_data = valid_cards[card["oracle_id"]]
-            card_data.raw_data.append(card)
-            card_data.prices += prices
+            card_data.raw_data.append(trim_printing(card))
+            card_data.price = min(card_data.price, *prices)
+
+    meld_results = {}
+    for card_data in valid_cards.values():
+        for printing in card_data.raw_data:
+            for part in printing.get("all_parts", ()):
+                if part["id"] in meld_cards:
+                    meld_results[part["id"]] = meld_cards[part["id"]]
+    del meld_cards
+
+    for card_data in valid_cards.values():
+        card_data.precompute()
 
     last_bracket = 0
     cards_by_rarity = []
@@ -268,7 +574,7 @@ def parse_card_list():
             [
                 card
                 for card in valid_cards.values()
-                if min(card.prices) > last_bracket and min(card.prices) <= bracket
+                if card.price > last_bracket and card.price <= bracket
             ]
         )
         for card in cards_by_rarity[-1]:
@@ -276,6 +582,77 @@ def parse_card_list():
         i += 1
         last_bracket = bracket
 
+    index_card_pool()
+
+
+def card_name_key(name: str) -> str:
+    return re.sub(r"\s*//\s*", " // ", " ".join(name.casefold().split()))
+
+
+def name_trigrams(key: str) -> typing.Set[str]:
+    padded = f"  {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def index_card_pool():
+    global cards_by_name, card_name_trigrams, deck_card_pool, deck_pools
+
+    cards_by_name = {}
+    for card in valid_cards.values():
+        cards_by_name.setdefault(card_name_key(card.name()), card)
+    for card in valid_cards.values():
+        for face in card.raw_data[0].get("card_faces", ()):
+            cards_by_name.setdefault(card_name_key(face["name"]), card)
+
+    card_name_trigrams = {}
+    for key in cards_by_name:
+        for trigram in name_trigrams(key):
+            card_name_trigrams.setdefault(trigram, []).append(key)
+
+    deck_card_pool = [
+        c
+        for c in valid_cards.values()
+        if "Land" not in c.supertypes() and "Conspiracy" not in c.supertypes()
+    ]
+    deck_pools = {}
+
+
+card_list_future: typing.Union["concurrent.futures.Future", None] = None
+
+
+def load_card_list_in_background() -> "concurrent.futures.Future":
+    global card_list_future
+
+    future: "concurrent.futures.Future" = concurrent.futures.Future()
+
+    def load():
+        start = time.perf_counter()
+        try:
+            from_snapshot = parse_card_list()
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result((time.perf_counter() - start, from_snapshot))
+
+    card_list_future = future
+    threading.Thread(target=load, daemon=True).start()
+    return future
+
+
+def wait_for_card_list():
+    if card_list_future is None:
+        load_card_list_in_background()
+    if not card_list_future.done():
+        print("Loading card list... ", end="", flush=True)
+        for spinner in itertools.cycle("|/-\\"):
+            try:
+                seconds, from_snapshot = card_list_future.result(timeout=0.1)
+                break
+            except concurrent.futures.TimeoutError:
+                print(f"{spinner}\b", end="", flush=True)
+        print(f"done in {seconds:.2f}s{' (from snapshot)' if from_snapshot else ''}.")
+    card_list_future.result()
+
 
 class SealedProduct:
     contents: typing.List[CardData]
@@ -306,6 +683,44 @@ def make_pack() -> SealedProduct:
     return SealedProduct(pack, {basic_land: 1})
 
 
+PACK_COMMONS = 10
+PACK_UNCOMMONS = 3
+PACK_MYTHIC_CHANCE = 1 / 8.0
+PACK_SPECIAL_BASIC_CHANCE = 1 / 8.0
+
+
+def pack_rng(seed: typing.Union[int, None] = None, stream: int = 0) -> random.Random:
+    if seed is None:
+        return random.Random()
+    return random.Random(f"{seed}/{stream}")
+
+
+def make_packs(
+    n: int, seed: typing.Union[int, None] = None, stream: int = 0
+) -> typing.List[SealedProduct]:
+    # the same seed and stream always make the same packs
+    rng = pack_rng(seed, stream)
+    mythic = [rng.random() < PACK_MYTHIC_CHANCE for _ in range(n)]
+    special_basic = [rng.random() < PACK_SPECIAL_BASIC_CHANCE for _ in range(n)]
+    commons = rng.choices(cards_by_rarity[0], k=PACK_COMMONS * n)
+    uncommons = rng.choices(cards_by_rarity[1], k=PACK_UNCOMMONS * n)
+    rares = iter(rng.choices(cards_by_rarity[2], k=mythic.count(False)))
+    mythics = iter(rng.choices(cards_by_rarity[3], k=mythic.count(True)))
+    special_basics = iter(rng.choices(SPECIAL_BASIC_LANDS, k=special_basic.count(True)))
+    basics = iter(
+        rng.choices(list(COLOR_TO_BASIC_LAND.values()), k=special_basic.count(False))
+    )
+
+    packs: typing.List[SealedProduct] = []
+    for i in range(n):
+        pack = commons[PACK_COMMONS * i : PACK_COMMONS * (i + 1)]
+        pack += uncommons[PACK_UNCOMMONS * i : PACK_UNCOMMONS * (i + 1)]
+        pack.append(next(mythics) if mythic[i] else next(rares))
+        basic_land = next(special_basics) if special_basic[i] else next(basics)
+        packs.append(SealedProduct(pack, {basic_land: 1}))
+    return packs
+
+
 DECK_TOTAL = 60
 DECK_BASICS = 25
 DECK_RARITIES = [0] * 20 + [1] * 12 + [2] * 3 + [3] * 0
@@ -314,34 +729,36 @@ DECK_CREATURE_NONCREATURE = (
 )
 
 
+@functools.lru_cache(maxsize=None)
+def color_mask(color_id: str) -> int:
+    return sum(1 << COLORS.index(color) for color in set(color_id))
+
+
+def deck_pool(
+    mask: int, creature: typing.Union[bool, None], rarity: int
+) -> typing.List[CardData]:
+    if (mask, creature, rarity) not in deck_pools:
+        for split in (None, True, False):
+            for bracket in range(len(BRACKETS)):
+                deck_pools[(mask, split, bracket)] = []
+        for card in deck_card_pool:
+            if card.new_rarity < 0 or color_mask(card.color_id) & ~mask:
+                continue
+            deck_pools[(mask, None, card.new_rarity)].append(card)
+            is_creature = "Creature" in card.supertypes()
+            deck_pools[(mask, is_creature, card.new_rarity)].append(card)
+    return deck_pools[(mask, creature, rarity)]
+
+
 def make_deck() -> SealedProduct:
     color1 = random.choice(COLORS)
     color2 = random.choice(COLORS)
-    color_id = "".join(sorted(set(color1 + color2)))
+    mask = color_mask(color1 + color2)
 
     pack: typing.List[CardData] = []
     basics: typing.Dict[str, int] = {}
-    deck_valid_cards = [
-        c
-        for c in valid_cards.values()
-        if "Land" not in c.supertypes()
-        and "Conspiracy" not in c.supertypes()
-        and "".join(sorted(c.color_id)) in color_id
-    ]
-    deck_valid_noncreature_cards = [
-        c for c in deck_valid_cards if "Creature" not in c.supertypes()
-    ]
-    deck_valid_creature_cards = [
-        c for c in deck_valid_cards if "Creature" in c.supertypes()
-    ]
-
     for rarity, creature in zip(DECK_RARITIES, DECK_CREATURE_NONCREATURE):
-        pool = deck_valid_cards
-        if creature is True:
-            pool = deck_valid_creature_cards
-        if creature is False:
-            pool = deck_valid_noncreature_cards
-        pack.append(random.choice([c for c in pool if c.new_rarity == rarity]))
+        pack.append(random.choice(deck_pool(mask, creature, rarity)))
 
     total_basics = DECK_BASICS
     if any(c.needs_snow for c in pack):
@@ -397,8 +814,13 @@ version_control:
 	type: none
 """
 
-CARD_TEMPLATE = """mse_version: 2.1.2
-card:
+# bump this whenever the templates or card formatting change
+MSE_TEMPLATE_VERSION = 1
+
+# card files start with this; cards written into the set file go without it
+CARD_FILE_HEADER = "mse_version: 2.1.2\n"
+
+CARD_TEMPLATE = """card:
 	has_styling: false
 	extra_data:
 		magic-old:
@@ -421,8 +843,7 @@ card:
 	index: @INDEX@
 """
 
-BASIC_LAND_TEMPLATE = """mse_version: 2.1.2
-card:
+BASIC_LAND_TEMPLATE = """card:
 	has_styling: false
 	extra_data:
 		magic-old:
@@ -439,6 +860,22 @@ card:
 	watermark: mana symbol @SYMBOL@
 """
 
+
+class MSETemplate:
+    parts: typing.List[str]
+
+    def __init__(self, template: str) -> None:
+        self.parts = re.split(r"@([A-Z]+)@", template)
+
+    def render(self, **fields: str) -> str:
+        parts = self.parts.copy()
+        parts[1::2] = [fields[name] for name in self.parts[1::2]]
+        return "".join(parts)
+
+
+MSE_CARD_TEMPLATE = MSETemplate(CARD_TEMPLATE)
+MSE_BASIC_LAND_TEMPLATE = MSETemplate(BASIC_LAND_TEMPLATE)
+
 MSE_RARITIES = ("common", "uncommon", "rare", "mythic rare")
 COLORS_TO_CARD_BACKS = {
     "W": "white",
@@ -463,56 +900,103 @@ MSE_PATH = os.path.join(PLH_HOME, "MSE/magicseteditor.com")
 IMAGE_FORMAT = "{card.index}.png"
 
 
-def mse_format_symbols(s: str) -> str:
-    def symfmt(m: re.Match) -> str:
-        sym = m.group(1)
-        result = sym
-        if sym == "TK":
-            result = "D"  # TODO: handle this when Unfinity support is added to MSE
-        if sym == "CHAOS":
-            result = "A"
-        if sym == "P":
-            result = "H"
-        if re.match(r"[^/]+/P", sym) or re.match(r"[^/]+/[^/]+/P", sym):
-            result = f"H/{sym[:-2]}"
-        if re.match(r"\d\d+", sym):
-            result = f"[{sym}]"
-        return "{" + result + "}"
+MSE_FORMAT_CACHE_SIZE = 1 << 14
+
+
+@functools.lru_cache(maxsize=MSE_FORMAT_CACHE_SIZE)
+def mse_symbol(sym: str) -> str:
+    result = sym
+    if sym == "TK":
+        result = "D"  # TODO: handle this when Unfinity support is added to MSE
+    if sym == "CHAOS":
+        result = "A"
+    if sym == "P":
+        result = "H"
+    if re.match(r"[^/]+/P", sym) or re.match(r"[^/]+/[^/]+/P", sym):
+        result = f"H/{sym[:-2]}"
+    if re.match(r"\d\d+", sym):
+        result = f"[{sym}]"
+    return result
+
 
-    return re.sub(r"{([^}]*)}", symfmt, s)
+MSE_MANA_COST_RE = re.compile(r"{([^}]*)}|[{}]")
+MSE_MANA_COST_TRANSLATION = str.maketrans("", "", "{}")
 
 
+@functools.lru_cache(maxsize=MSE_FORMAT_CACHE_SIZE)
 def mse_format_mana_cost(s: str) -> str:
-    return mse_format_symbols(s).replace("{", "").replace("}", "")
+    return MSE_MANA_COST_RE.sub(
+        lambda m: mse_symbol(m.group(1) or "").translate(MSE_MANA_COST_TRANSLATION),
+        s,
+    )
 
 
-def mse_format_rules(card: CardData, face, s: str) -> str:
+MSE_RULES_MARKUP = {
+    "\n": "\n\t\t",
+    "{": "<sym>",
+    "}": "</sym>",
+    "(": "<i>(",
+    ")": ")</i>",
+}
+MSE_RULES_TRANSLATION = str.maketrans(MSE_RULES_MARKUP)
+MSE_LOYALTY = r"(?P<sign>[+\-−=])(?P<loyalty>\d+|[XYZ]): |(?P<zero>0: )"
+MSE_LOYALTY_RE = re.compile(MSE_LOYALTY)
+MSE_CHAPTER = r"(?P<chapter>\b[IVX]+)"
+MSE_CHAPTER_RE = re.compile(MSE_CHAPTER)
+# loyalty costs only count on planeswalkers, and chapter numbers on sagas
+MSE_RULES_RES = {
+    (planeswalker, saga): re.compile(
+        "|".join(
+            [r"{(?P<sym>[^}]*)}|[{}()\n]"]
+            + [MSE_LOYALTY] * planeswalker
+            + [MSE_CHAPTER] * saga
+        )
+    )
+    for planeswalker in (False, True)
+    for saga in (False, True)
+}
+
+
+def mse_loyalty(m: re.Match) -> str:
+    if m.group("zero"):
+        return "<sym>+0</sym>: "
+    sign = "-" if m.group("sign") in "-−" else m.group("sign")
+    return f"<sym>{sign}{m.group('loyalty')}</sym>: "
+
+
+def mse_chapter(m: re.Match) -> str:
+    return f"<no-sym>{m.group(0)}</no-sym>"
+
+
+@functools.lru_cache(maxsize=MSE_FORMAT_CACHE_SIZE)
+def mse_rules_markup(s: str, planeswalker: bool, saga: bool) -> str:
     if not s:
         return s
-    result = (
-        "<kw-0>"
-        + mse_format_symbols(s)
-        .replace("\n", "\n\t\t")
-        .replace("{", "<sym>")
-        .replace("}", "</sym>")
-        .replace("(", "<i>(")
-        .replace(")", ")</i>")
-        + "</kw-0>"
+
+    def markup(m: re.Match) -> str:
+        kind = m.lastgroup
+        if kind is None:
+            return MSE_RULES_MARKUP[m.group(0)]
+        if kind == "chapter":
+            return mse_chapter(m)
+        if kind == "sym":
+            sym = mse_symbol(m.group("sym")).translate(MSE_RULES_TRANSLATION)
+            result = f"<sym>{sym}</sym>"
+            if planeswalker:
+                result = MSE_LOYALTY_RE.sub(mse_loyalty, result)
+        else:
+            result = mse_loyalty(m)
+        if saga:
+            result = MSE_CHAPTER_RE.sub(mse_chapter, result)
+        return result
+
+    return "<kw-0>" + MSE_RULES_RES[planeswalker, saga].sub(markup, s) + "</kw-0>"
+
+
+def mse_format_rules(card: CardData, face, s: str) -> str:
+    return mse_rules_markup(
+        s, "Planeswalker" in card.supertypes(face), "Saga" in card.subtypes(face)
     )
-    if "Planeswalker" in card.supertypes(face):
-        result = re.sub(
-            r"\+(\d+|[XYZ]): ", lambda m: f"<sym>+{m.group(1)}</sym>: ", result
-        )
-        result = re.sub(
-            r"[\-−](\d+|[XYZ]): ", lambda m: f"<sym>-{m.group(1)}</sym>: ", result
-        )
-        result = re.sub(
-            r"=(\d+|[XYZ]): ", lambda m: f"<sym>={m.group(1)}</sym>: ", result
-        )
-        result = re.sub(r"0: ", lambda m: f"<sym>+0</sym>: ", result)
-    if "Saga" in card.subtypes(face):
-        result = re.sub(r"\b[IVX]+", lambda m: f"<no-sym>{m.group(0)}</no-sym>", result)
-    return result
 
 
 def mse_format_flavor(s: str) -> str:
@@ -523,233 +1007,1399 @@ def mse_format_flavor(s: str) -> str:
 
 CARD_ART_WIDTH = 286
 CARD_ART_HEIGHT = 233
+CARD_ART_DPI = 150
 CARD_ART_RATIO = float(CARD_ART_WIDTH) / float(CARD_ART_HEIGHT)
 
+# MSE exports the old frame at its card dpi
+ART_EXPORT_DPI = 300
+ART_FORMATS = ("PNG", "JPEG")
+ART_PNG_COMPRESS_LEVEL = 6
+ART_JPEG_QUALITY = 95
+
+
+class ArtOptions(typing.NamedTuple):
+    dpi: int = ART_EXPORT_DPI
+    format: str = "PNG"
+    quality: typing.Union[int, None] = None
+
+    @property
+    def size(self) -> typing.Tuple[int, int]:
+        return (
+            round(CARD_ART_WIDTH * self.dpi / CARD_ART_DPI),
+            round(CARD_ART_HEIGHT * self.dpi / CARD_ART_DPI),
+        )
+
+    def save(self, image: "PIL.Image.Image", file: typing.BinaryIO):
+        if self.format == "JPEG":
+            quality = ART_JPEG_QUALITY if self.quality is None else self.quality
+            image.convert("RGB").save(file, "JPEG", quality=quality, subsampling=0)
+        else:
+            level = ART_PNG_COMPRESS_LEVEL if self.quality is None else self.quality
+            image.save(file, "PNG", compress_level=level)
+
+
+# Scryfall asks for 50-100ms between requests
+SCRYFALL_REQUESTS_PER_SECOND = 10
+ART_FETCH_WORKERS = 8
+ART_FETCH_RETRIES = 3
+ART_FETCH_BACKOFF = 0.5
+ART_FETCH_TIMEOUT = 30
+
+
+class TokenBucket:
+    rate: float
+    capacity: float
+    tokens: float
+    updated: float
+    lock: threading.Lock
+
+    def __init__(self, rate: float, capacity: float = 1) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # take a token even into debt, then sleep it off outside the lock
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+scryfall_rate_limiter = TokenBucket(SCRYFALL_REQUESTS_PER_SECOND)
+
+
+@functools.lru_cache(maxsize=None)
+def http_session():
+    import requests
+    import requests.adapters
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=ART_FETCH_WORKERS, pool_maxsize=ART_FETCH_WORKERS
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def fetch_art(url: str) -> typing.Union[bytes, None]:
+    import requests
 
-def mse_download_card_image(output_dir: str, i: int, printing, face, face_data):
-    image_filename = ""
+    for attempt in range(ART_FETCH_RETRIES + 1):
+        last_attempt = attempt == ART_FETCH_RETRIES
+        scryfall_rate_limiter.acquire()
+        try:
+            response = http_session().get(url, timeout=ART_FETCH_TIMEOUT)
+        except requests.RequestException:
+            if last_attempt:
+                raise
+        else:
+            if response.ok:
+                return response.content
+            # only worth retrying if the server is overloaded or throttling us
+            if last_attempt or (
+                response.status_code != 429 and response.status_code < 500
+            ):
+                return None
+        time.sleep(ART_FETCH_BACKOFF * 2**attempt)
+    return None
+
+
+ART_CACHE_DIR = os.path.join(PLH_HOME, "art_cache")
+ART_CACHE_MAX_BYTES = 2 << 30
+
+
+class ArtCache:
+    directory: str
+    max_bytes: float
+    hits: int
+    misses: int
+    entries: typing.Dict[str, typing.Dict[str, typing.Any]]
+    prefetched: typing.Set[str]
+    offline: bool
+    lock: threading.Lock
+
+    def __init__(
+        self,
+        directory: str = ART_CACHE_DIR,
+        max_bytes: float = ART_CACHE_MAX_BYTES,
+        clean: bool = True,
+        offline: bool = False,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.entries = read_json_file(self.index_filepath) or {}
+        self.prefetched = set()
+        self.lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.processed_dir, exist_ok=True)
+        if clean:
+            self.clean()
+
+    def clean(self):
+        known = {entry["sha256"] for entry in self.entries.values()}
+        for filename in os.listdir(self.objects_dir):
+            if filename not in known:
+                os.remove(os.path.join(self.objects_dir, filename))
+        for filename in os.listdir(self.processed_dir):
+            if filename.split(".")[0] not in known:
+                os.remove(os.path.join(self.processed_dir, filename))
+
+    @property
+    def index_filepath(self) -> str:
+        return os.path.join(self.directory, "index.json")
 
-    image_url = None
+    @property
+    def objects_dir(self) -> str:
+        return os.path.join(self.directory, "objects")
+
+    @property
+    def processed_dir(self) -> str:
+        return os.path.join(self.directory, "processed")
+
+    def object_filepath(self, sha256: str) -> str:
+        return os.path.join(self.objects_dir, sha256)
+
+    def processed_filepath(self, sha256: str, *variant) -> str:
+        variant_hash = hashlib.sha256(repr(variant).encode()).hexdigest()[:16]
+        return os.path.join(self.processed_dir, f"{sha256}.{variant_hash}")
+
+    def count_processed(self):
+        # other processes add processed art too, so it's tallied from disk
+        sizes = {}
+        processed_files: typing.Dict[str, typing.List[str]] = {}
+        for filename in os.listdir(self.processed_dir):
+            sha256 = filename.split(".")[0]
+            size = os.path.getsize(os.path.join(self.processed_dir, filename))
+            sizes[sha256] = sizes.get(sha256, 0) + size
+            processed_files.setdefault(sha256, []).append(filename)
+        with self.lock:
+            for entry in self.entries.values():
+                entry["processed_size"] = sizes.get(entry["sha256"], 0)
+            self.evict(processed_files)
+
+    def get(self, url: str) -> typing.Union[bytes, None]:
+        with self.lock:
+            entry = self.entries.get(url)
+        if entry is None:
+            return None
+        try:
+            with open(self.object_filepath(entry["sha256"]), "rb") as file:
+                data = file.read()
+        except OSError:
+            data = None
+        with self.lock:
+            if data is None or hashlib.sha256(data).hexdigest() != entry["sha256"]:
+                if self.entries.get(url) is entry:
+                    self.remove(url)
+                return None
+            entry["used"] = time.time()
+        return data
+
+    def put(self, url: str, data: bytes):
+        sha256 = hashlib.sha256(data).hexdigest()
+        filepath = self.object_filepath(sha256)
+        if not os.path.exists(filepath):
+            temp_filepath = f"{filepath}.{threading.get_ident()}.tmp"
+            with open(temp_filepath, "wb") as file:
+                file.write(data)
+            os.replace(temp_filepath, filepath)
+        with self.lock:
+            self.entries[url] = {
+                "sha256": sha256,
+                "size": len(data),
+                "used": time.time(),
+            }
+
+    def remove(
+        self,
+        url: str,
+        processed_files: typing.Union[typing.Dict[str, typing.List[str]], None] = None,
+    ):
+        entry = self.entries.pop(url)
+        if not any(e["sha256"] == entry["sha256"] for e in self.entries.values()):
+            try:
+                os.remove(self.object_filepath(entry["sha256"]))
+            except OSError:
+                pass
+            if processed_files is None:
+                filenames = [
+                    filename
+                    for filename in os.listdir(self.processed_dir)
+                    if filename.split(".")[0] == entry["sha256"]
+                ]
+            else:
+                filenames = processed_files.pop(entry["sha256"], [])
+            for filename in filenames:
+                os.remove(os.path.join(self.processed_dir, filename))
+
+    def evict(self, processed_files: typing.Dict[str, typing.List[str]]):
+        sizes = {
+            e["sha256"]: e["size"] + e.get("processed_size", 0)
+            for e in self.entries.values()
+        }
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        for url in sorted(self.entries, key=lambda url: self.entries[url]["used"]):
+            if total <= self.max_bytes:
+                break
+            sha256 = self.entries[url]["sha256"]
+            self.remove(url, processed_files)
+            if sha256 in sizes and not os.path.exists(self.object_filepath(sha256)):
+                total -= sizes.pop(sha256)
+
+    def record_uses(self, urls: typing.Iterable[str]):
+        with self.lock:
+            for url in urls:
+                # art that prefetch just downloaded still counts as a miss
+                if url in self.entries and url not in self.prefetched:
+                    self.hits += 1
+                else:
+                    self.prefetched.discard(url)
+                    self.misses += 1
+
+    def fetch(self, url: str) -> typing.Union[bytes, None]:
+        data = self.get(url)
+        if data is None and not self.offline:
+            data = fetch_art(url)
+            if data is not None:
+                self.put(url, data)
+        return data
+
+    def prefetch(self, urls: typing.Iterable[str]):
+        def download(url: str):
+            data = fetch_art(url)
+            if data is not None:
+                self.put(url, data)
+                with self.lock:
+                    self.prefetched.add(url)
+
+        missing = [url for url in dict.fromkeys(urls) if url not in self.entries]
+        with concurrent.futures.ThreadPoolExecutor(ART_FETCH_WORKERS) as executor:
+            for url in missing:
+                executor.submit(download, url)
+
+    def fetch_missing(self, urls: typing.Iterable[str]):
+        for url in dict.fromkeys(urls):
+            if url not in self.entries:
+                self.fetch(url)
+
+    def save(self):
+        with self.lock:
+            entries = dict(self.entries)
+        write_json_file(self.index_filepath, entries)
+
+    def stats(self) -> str:
+        return f"Art cache: {self.hits} hits, {self.misses} misses."
+
+
+art_cache: typing.Union[ArtCache, None] = None
+art_cache_max_bytes: float = ART_CACHE_MAX_BYTES
+
+
+def get_art_cache() -> ArtCache:
+    global art_cache
+
+    if art_cache is None:
+        art_cache = ArtCache(max_bytes=art_cache_max_bytes)
+    return art_cache
+
+
+def link_file(src: str, dst: str):
+    if os.path.exists(dst):
+        if os.path.exists(src) and os.path.samefile(src, dst):
+            return
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        if not os.path.exists(src):
+            raise
+        shutil.copyfile(src, dst)
+
+
+def card_image_url(printing, face_data) -> typing.Union[str, None]:
     if "image_uris" in face_data and "art_crop" in face_data["image_uris"]:
-        image_url = face_data["image_uris"]["art_crop"]
+        return face_data["image_uris"]["art_crop"]
     elif "image_uris" in printing and "art_crop" in printing["image_uris"]:
-        image_url = printing["image_uris"]["art_crop"]
-
-    if image_url:
-        response = requests.get(image_url)
-        if response.ok:
-            # open image
-            image = PIL.Image.open(io.BytesIO(response.content))
-            # if split, then pick the right half-image
-            if printing["layout"] == "split":
-                if face is None or face == 0:
-                    resize = (0, 0, image.width // 2, image.height)
-                else:
-                    resize = (image.width // 2, 0, image.width, image.height)
-                image = image.crop(resize)
-            # flip around the back half of a flip card
-            if printing["layout"] == "flip" and face == 1:
-                image = image.transpose(PIL.Image.ROTATE_180)
-            # fit to aspect ratio
-            ratio = float(image.width) / float(image.height)
-            if ratio > CARD_ART_RATIO:
-                # crop the left and right
-                new_width = int(CARD_ART_RATIO * image.height)
-                offset = int((image.width - new_width) / 2)
-                resize = (offset, 0, image.width - offset, image.height)
+        return printing["image_uris"]["art_crop"]
+    return None
+
+
+def mse_card_art(
+    printing, face, face_data, art_options: ArtOptions = ArtOptions()
+) -> typing.Union[str, None]:
+    import PIL.Image
+
+    image_url = card_image_url(printing, face_data)
+    if not image_url:
+        return None
+    cache = get_art_cache()
+    image_data = cache.fetch(image_url)
+    if image_data is None:
+        return None
+
+    processed_filepath = cache.processed_filepath(
+        hashlib.sha256(image_data).hexdigest(),
+        printing["layout"],
+        face or 0,
+        CARD_ART_RATIO,
+        art_options,
+    )
+    if not os.path.exists(processed_filepath):
+        # open image
+        image = PIL.Image.open(io.BytesIO(image_data))
+        # let JPEGs decode at a fraction of their size if that's big enough
+        width, height = image.size
+        if printing["layout"] == "split":
+            width //= 2
+        width = min(width, int(CARD_ART_RATIO * height))
+        height = min(height, int(width / CARD_ART_RATIO))
+        target_width, target_height = art_options.size
+        scale = max(target_width / width, target_height / height)
+        if scale < 1:
+            image.draft(
+                image.mode,
+                (math.ceil(image.width * scale), math.ceil(image.height * scale)),
+            )
+        # if split, then pick the right half-image
+        if printing["layout"] == "split":
+            if face is None or face == 0:
+                resize = (0, 0, image.width // 2, image.height)
             else:
-                # crop the top and bottom
-                new_height = int(image.width / CARD_ART_RATIO)
-                offset = int((image.height - new_height) / 2)
-                resize = (0, offset, image.width, image.height - offset)
+                resize = (image.width // 2, 0, image.width, image.height)
             image = image.crop(resize)
-            # save image
-            image_filename = f"image {i} {face or 0}"
-            with open(os.path.join(output_dir, image_filename), "wb") as image_file:
-                image.save(image_file, format="PNG")
-
+        # flip around the back half of a flip card
+        if printing["layout"] == "flip" and face == 1:
+            image = image.transpose(PIL.Image.ROTATE_180)
+        # fit to aspect ratio
+        ratio = float(image.width) / float(image.height)
+        if ratio > CARD_ART_RATIO:
+            # crop the left and right
+            new_width = int(CARD_ART_RATIO * image.height)
+            offset = int((image.width - new_width) / 2)
+            resize = (offset, 0, image.width - offset, image.height)
+        else:
+            # crop the top and bottom
+            new_height = int(image.width / CARD_ART_RATIO)
+            offset = int((image.height - new_height) / 2)
+            resize = (0, offset, image.width, image.height - offset)
+        image = image.crop(resize)
+        image.thumbnail(
+            (target_width, target_height), PIL.Image.LANCZOS, reducing_gap=2.0
+        )
+        # save image, in one go, since other processes may want the same art
+        temp_filepath = f"{processed_filepath}.{os.getpid()}.tmp"
+        with open(temp_filepath, "wb") as image_file:
+            art_options.save(image, image_file)
+        os.replace(temp_filepath, processed_filepath)
+    return processed_filepath
+
+
+def mse_download_card_image(
+    output_dir: str,
+    i: int,
+    printing,
+    face,
+    face_data,
+    art_options: ArtOptions = ArtOptions(),
+) -> str:
+    processed_filepath = mse_card_art(printing, face, face_data, art_options)
+    if processed_filepath is None:
+        return ""
+    image_filename = f"image {i} {face or 0}"
+    link_file(processed_filepath, os.path.join(output_dir, image_filename))
     return image_filename
 
 
-def mse_gen_card(output_dir: str, i: int, card: CardData, printing, face, face_data):
-    image_filename = mse_download_card_image(output_dir, i, printing, face, face_data)
+def mse_card_text(
+    i: int, card: CardData, printing, face, face_data, image_filename: str
+) -> str:
+    power = face_data.get("power", "")
+    if "Planeswalker" in card.supertypes(face):
+        power = face_data.get("loyalty", "")
+    if "Battle" in card.supertypes(face):
+        power = face_data.get("defense", "")
+
+    text = MSE_CARD_TEMPLATE.render(
+        NAME=card.name(face),
+        COST=mse_format_mana_cost(face_data.get("mana_cost", "")),
+        SUPERTYPE=" ".join(
+            f"<word-list-type>{t}</word-list-type>" for t in card.supertypes(face)
+        ),
+        SUBTYPE=" ".join(
+            f"<word-list-type>{t}</word-list-type>" for t in card.subtypes(face)
+        ),
+        RARITY=MSE_RARITIES[card.new_rarity],
+        POWER=power,
+        TOUGHNESS=face_data.get("toughness", ""),
+        ARTIST=face_data.get("artist", printing.get("artist", "Unknown")),
+        IMAGE=image_filename,
+        RULES=mse_format_rules(card, face, face_data.get("oracle_text", "")),
+        FLAVOR=mse_format_flavor(face_data.get("flavor_text", "")),
+        INDEX=str(i),
+    )
+    if (
+        "color_indicator" in face_data
+        and face_data["color_indicator"]
+        and "Artifact" not in card.supertypes(face)
+        and "Land" not in card.supertypes(face)
+    ):
+        color = "multicolor"
+        if len(face_data["color_indicator"]) == 1:
+            color = COLORS_TO_CARD_BACKS[face_data["color_indicator"][0]]
+        text += f"\tcard_color: {color}\n"
+    return text
+
+
+def mse_basic_land_text(i: int, printing, image_filename: str) -> str:
+    types = printing["type_line"].split("—")
+    supertypes = types[0].strip().split(" ")
+    subtypes = []
+    if len(types) > 1:
+        subtypes = types[1].strip().split(" ")
+    return MSE_BASIC_LAND_TEMPLATE.render(
+        NAME=printing["name"],
+        SUPERTYPE=" ".join(f"<word-list-type>{t}</word-list-type>" for t in supertypes),
+        SUBTYPE=" ".join(f"<word-list-type>{t}</word-list-type>" for t in subtypes),
+        ARTIST=printing.get("artist", "Unknown"),
+        IMAGE=image_filename,
+        INDEX=str(i),
+        SYMBOL=COLORS_TO_WATERMARKS[BASIC_LAND_TO_COLOR[printing["name"]]],
+    )
+
+
+def mse_gen_card(
+    output_dir: str,
+    i: int,
+    card: CardData,
+    printing,
+    face,
+    face_data,
+    art_options: ArtOptions = ArtOptions(),
+):
+    image_filename = mse_download_card_image(
+        output_dir, i, printing, face, face_data, art_options
+    )
 
     with open(
         os.path.join(output_dir, f"card {i} {face or 0}"), "w", encoding="utf-8"
     ) as card_file:
-        power = face_data.get("power", "")
-        if "Planeswalker" in card.supertypes(face):
-            power = face_data.get("loyalty", "")
-        if "Battle" in card.supertypes(face):
-            power = face_data.get("defense", "")
-
+        card_file.write(CARD_FILE_HEADER)
         card_file.write(
-            CARD_TEMPLATE.replace("@NAME@", card.name(face))
-            .replace("@COST@", mse_format_mana_cost(face_data.get("mana_cost", "")))
-            .replace(
-                "@SUPERTYPE@",
-                " ".join(
-                    f"<word-list-type>{t}</word-list-type>"
-                    for t in card.supertypes(face)
-                ),
-            )
-            .replace(
-                "@SUBTYPE@",
-                " ".join(
-                    f"<word-list-type>{t}</word-list-type>" for t in card.subtypes(face)
-                ),
-            )
-            .replace("@RARITY@", MSE_RARITIES[card.new_rarity])
-            .replace("@POWER@", power)
-            .replace("@TOUGHNESS@", face_data.get("toughness", ""))
-            .replace(
-                "@ARTIST@", face_data.get("artist", printing.get("artist", "Unknown"))
-            )
-            .replace("@IMAGE@", image_filename)
-            .replace(
-                "@RULES@",
-                mse_format_rules(card, face, face_data.get("oracle_text", "")),
-            )
-            .replace("@FLAVOR@", mse_format_flavor(face_data.get("flavor_text", "")))
-            .replace("@INDEX@", str(i))
+            mse_card_text(i, card, printing, face, face_data, image_filename)
         )
-        if (
-            "color_indicator" in face_data
-            and face_data["color_indicator"]
-            and "Artifact" not in card.supertypes(face)
-            and "Land" not in card.supertypes(face)
-        ):
-            color = "multicolor"
-            if len(face_data["color_indicator"]) == 1:
-                color = COLORS_TO_CARD_BACKS[face_data["color_indicator"][0]]
-            card_file.write(f"\tcard_color: {color}\n")
 
 
-def mse_gen_basic_land(output_dir: str, i: int, printing):
-    image_filename = mse_download_card_image(output_dir, i, printing, None, printing)
+def mse_gen_basic_land(
+    output_dir: str, i: int, printing, art_options: ArtOptions = ArtOptions()
+):
+    image_filename = mse_download_card_image(
+        output_dir, i, printing, None, printing, art_options
+    )
 
     with open(
         os.path.join(output_dir, f"card {i} 0"), "w", encoding="utf-8"
     ) as card_file:
-        types = printing["type_line"].split("—")
-        supertypes = types[0].strip().split(" ")
-        subtypes = []
-        if len(types) > 1:
-            subtypes = types[1].strip().split(" ")
-        card_file.write(
-            BASIC_LAND_TEMPLATE.replace("@NAME@", printing["name"])
-            .replace(
-                "@SUPERTYPE@",
-                " ".join(f"<word-list-type>{t}</word-list-type>" for t in supertypes),
-            )
-            .replace(
-                "@SUBTYPE@",
-                " ".join(f"<word-list-type>{t}</word-list-type>" for t in subtypes),
-            )
-            .replace("@ARTIST@", printing.get("artist", "Unknown"))
-            .replace("@IMAGE@", image_filename)
-            .replace("@INDEX@", str(i))
-            .replace(
-                "@SYMBOL@", COLORS_TO_WATERMARKS[BASIC_LAND_TO_COLOR[printing["name"]]]
-            )
-        )
+        card_file.write(CARD_FILE_HEADER)
+        card_file.write(mse_basic_land_text(i, printing, image_filename))
 
 
-def mse_gen_set(output_dir: str, *packs: SealedProduct):
-    if os.path.exists(output_dir):
-        shutil.rmtree(output_dir)
-    os.mkdir(output_dir)
+MSE_MANIFEST_FILENAME = "manifest.json"
+MSE_MANIFEST_VERSION = 1
+MSE_MANIFEST_SAVE_INTERVAL = 5
+
+MSESlot = typing.Tuple[typing.Union[CardData, None], typing.Any, int]
+
+
+def mse_previous_printing(
+    previous: typing.List[typing.Any], i: int, printings: typing.List[typing.Any]
+) -> typing.Union[int, None]:
+    if i < len(previous) and previous[i]:
+        for n, printing in enumerate(printings):
+            if printing["id"] == previous[i]["printing"]:
+                return n
+    return None
+
+
+def mse_set_slots(
+    *packs: SealedProduct, previous: typing.List[typing.Any] = ()
+) -> typing.List[MSESlot]:
+    # same draws in the same order as always, so seeded runs don't change
+    slots = []
+    for pack in packs:
+        for basic, n_basics in pack.basics.items():
+            for _ in range(n_basics):
+                printings = valid_basics[basic]
+                printing = random.choice(printings)
+                n = mse_previous_printing(previous, len(slots), printings)
+                if n is not None:
+                    printing = printings[n]
+                slots.append((None, printing, 0))
+
+        for card in pack.contents:
+            n_printing = random.choice(card.english_printings)
+            n = mse_previous_printing(
+                previous,
+                len(slots),
+                [card.raw_data[n_printing] for n_printing in card.english_printings],
+            )
+            if n is not None:
+                n_printing = card.english_printings[n]
+            slots.append((card, card.raw_data[n_printing], n_printing))
+    return slots
+
+
+def mse_slot_faces(card: typing.Union[CardData, None], printing, n_printing: int):
+    if card is not None and card.is_dfc:
+        return [(0, card.face(0, n_printing)), (1, card.face(1, n_printing))]
+    return [(None, printing)]
+
+
+def mse_slot_inputs(
+    card: typing.Union[CardData, None],
+    printing,
+    n_printing: int,
+    art_options: ArtOptions,
+) -> typing.Dict[str, typing.Any]:
+    faces = mse_slot_faces(card, printing, n_printing)
+    inputs = [printing, [face_data for _, face_data in faces], list(art_options)]
+    if card is not None:
+        inputs.append([(card.name(face), card.typeline(face)) for face, _ in faces])
+        inputs.append(card.new_rarity)
+    return {
+        "oracle_id": card and card.oracle_id,
+        "printing": printing["id"],
+        "faces": [face or 0 for face, _ in faces],
+        "template": MSE_TEMPLATE_VERSION,
+        "digest": hashlib.sha256(
+            json.dumps(inputs, sort_keys=True).encode("utf-8")
+        ).hexdigest(),
+    }
+
+
+def mse_gen_slot(
+    output_dir: str,
+    i: int,
+    card: typing.Union[CardData, None],
+    printing,
+    n_printing: int,
+    art_options: ArtOptions,
+    inline: bool = False,
+) -> typing.List[str]:
+    if inline:
+        for face, face_data in mse_slot_faces(card, printing, n_printing):
+            mse_download_card_image(
+                output_dir, i, printing, face, face_data, art_options
+            )
+    elif card is None:
+        mse_gen_basic_land(output_dir, i, printing, art_options)
+    else:
+        for face, face_data in mse_slot_faces(card, printing, n_printing):
+            mse_gen_card(output_dir, i, card, printing, face, face_data, art_options)
+
+    filenames = []
+    for face, _ in mse_slot_faces(card, printing, n_printing):
+        if not inline:
+            filenames.append(f"card {i} {face or 0}")
+        filenames.append(f"image {i} {face or 0}")
+    return [f for f in filenames if os.path.exists(os.path.join(output_dir, f))]
+
+
+def mse_init_worker(melds: typing.Dict[str, typing.Any], art_cache_dir: str):
+    global meld_results, art_cache
+
+    # workers never download, since each would have its own rate limiter
+    meld_results = melds
+    art_cache = ArtCache(art_cache_dir, math.inf, clean=False, offline=True)
+
+
+def mse_gen_set(
+    output_dir: str,
+    *packs: SealedProduct,
+    art_options: ArtOptions = ArtOptions(),
+    workers: int = 1,
+    inline: bool = False,
+) -> int:
+    manifest_filepath = os.path.join(output_dir, MSE_MANIFEST_FILENAME)
+    manifest = read_json_file(manifest_filepath)
+    if not manifest or manifest.get("version") != MSE_MANIFEST_VERSION:
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        os.mkdir(output_dir)
+        manifest = {"version": MSE_MANIFEST_VERSION, "slots": []}
 
     shutil.copy(
         MSE_SET_SYMBOL_FILEPATH, os.path.join(output_dir, MSE_SET_SYMBOL_FILENAME)
     )
 
-    with open(os.path.join(output_dir, "set"), "w", encoding="utf-8") as set_file:
-        set_file.write(SET_TEMPLATE)
-        i = 0
-        for pack in packs:
-            for basic, n_basics in pack.basics.items():
-                for _ in range(n_basics):
-                    set_file.write(f"include_file: card {i} 0\n")
-                    mse_gen_basic_land(
-                        output_dir, i, random.choice(valid_basics[basic])
-                    )
-                    i += 1
-
-            for card in pack.contents:
+    slots = mse_set_slots(*packs, previous=manifest["slots"])
+    art_urls = [
+        url
+        for card, printing, n_printing in slots
+        for _, face_data in mse_slot_faces(card, printing, n_printing)
+        for url in [card_image_url(printing, face_data)]
+        if url
+    ]
+    cache = get_art_cache()
+    cache.prefetch(art_urls)
+    cache.record_uses(art_urls)
+
+    # slots that are the same apart from their index are only generated once
+    inputs_by_slot = []
+    first_slots = {}
+    for i, (card, printing, n_printing) in enumerate(slots):
+        inputs = mse_slot_inputs(card, printing, n_printing, art_options)
+        if inline:
+            inputs["inline"] = True
+        inputs["same_as"] = first_slots.setdefault(inputs["digest"], i)
+        if inputs["same_as"] == i:
+            inputs["same_as"] = None
+        inputs_by_slot.append(inputs)
+
+    if not inline:
+        with open(os.path.join(output_dir, "set"), "w", encoding="utf-8") as set_file:
+            set_file.write(SET_TEMPLATE)
+            for i, (card, printing, n_printing) in enumerate(slots):
+                if inputs_by_slot[i]["same_as"] is not None:
+                    continue
                 set_file.write(f"include_file: card {i} 0\n")
-                if card.is_dfc:
+                if card is not None and card.is_dfc:
                     set_file.write(f"include_file: card {i} 1\n")
 
-                printing = random.choice(
-                    [c for c in card.raw_data if c["lang"] == "en"]
-                )
-                if card.is_dfc:
-                    mse_gen_card(
-                        output_dir,
-                        i,
-                        card,
-                        printing,
-                        0,
-                        card.face(0, card.raw_data.index(printing)),
-                    )
-                    mse_gen_card(
-                        output_dir,
-                        i,
-                        card,
-                        printing,
-                        1,
-                        card.face(1, card.raw_data.index(printing)),
-                    )
-                else:
-                    mse_gen_card(output_dir, i, card, printing, None, printing)
+    # forget changed slots first, so an interrupted run redoes them
+    entries = []
+    for i, inputs in enumerate(inputs_by_slot):
+        if inputs["same_as"] is not None:
+            entries.append(dict(inputs, files=[]))
+            continue
+        entry = manifest["slots"][i] if i < len(manifest["slots"]) else None
+        if entry and any(
+            entry.get(k) != inputs.get(k)
+            for k in set(inputs) | (set(entry) - {"files"})
+        ):
+            entry = None
+        entries.append(entry or inputs)
+    manifest["slots"] = [entry if "files" in entry else None for entry in entries]
+    write_json_file(manifest_filepath, manifest)
 
-                i += 1
+    todo = [i for i, entry in enumerate(manifest["slots"]) if entry is None]
+    tasks = [(output_dir, i, *slots[i], art_options, inline) for i in todo]
+    last_save = time.monotonic()
+
+    def done(i: int, filenames: typing.List[str]):
+        nonlocal last_save
+
+        manifest["slots"][i] = dict(entries[i], files=filenames)
+        if time.monotonic() - last_save > MSE_MANIFEST_SAVE_INTERVAL:
+            write_json_file(manifest_filepath, manifest)
+            last_save = time.monotonic()
+
+    try:
+        if workers > 1 and len(tasks) > 1:
+            melds = {
+                part["id"]: meld_results[part["id"]]
+                for card, _, _ in slots
+                if card is not None
+                for printing in card.raw_data
+                if printing["layout"] == "meld"
+                for part in printing["all_parts"]
+                if part["component"] == "meld_result"
+            }
+            cache.fetch_missing(art_urls)
+            cache.save()
+            with concurrent.futures.ProcessPoolExecutor(
+                workers, initializer=mse_init_worker, initargs=(melds, cache.directory)
+            ) as executor:
+                chunksize = max(1, len(tasks) // (workers * 4))
+                results = executor.map(mse_gen_slot, *zip(*tasks), chunksize=chunksize)
+                for i, filenames in zip(todo, results):
+                    done(i, filenames)
+        else:
+            for i, task in zip(todo, tasks):
+                done(i, mse_gen_slot(*task))
+    finally:
+        write_json_file(manifest_filepath, manifest)
+        cache.save()
+
+    if inline:
+        with open(
+            os.path.join(output_dir, "set"), "w", encoding="utf-8", buffering=1 << 20
+        ) as set_file:
+            set_file.write(SET_TEMPLATE)
+            for i, (card, printing, n_printing) in enumerate(slots):
+                if inputs_by_slot[i]["same_as"] is not None:
+                    continue
+                for face, face_data in mse_slot_faces(card, printing, n_printing):
+                    image_filename = f"image {i} {face or 0}"
+                    if image_filename not in manifest["slots"][i]["files"]:
+                        image_filename = ""
+                    if card is None:
+                        text = mse_basic_land_text(i, printing, image_filename)
+                    else:
+                        text = mse_card_text(
+                            i, card, printing, face, face_data, image_filename
+                        )
+                    set_file.write(text)
+
+    keep = {"set", MSE_SET_SYMBOL_FILENAME, MSE_MANIFEST_FILENAME}
+    for entry in manifest["slots"]:
+        keep.update(entry["files"])
+    for filename in os.listdir(output_dir):
+        if filename not in keep:
+            filepath = os.path.join(output_dir, filename)
+            if os.path.isdir(filepath):
+                shutil.rmtree(filepath)
+            else:
+                os.remove(filepath)
 
+    cache.count_processed()
+    cache.save()
 
-def mse_gen_card_images(output_dir: str) -> typing.List[str]:
-    subprocess.run(
-        [
-            MSE_PATH,
-            "--export-images",
-            os.path.join(output_dir, "set"),
-            os.path.join(output_dir, IMAGE_FORMAT),
-        ],
-        stdin=subprocess.DEVNULL,
-        stdout=sys.stdout,
-        stderr=sys.stderr,
-        check=True,
+    return sum(
+        os.path.getsize(os.path.join(output_dir, filename))
+        for filename in os.listdir(output_dir)
+        if filename.startswith("image ")
     )
 
-    for card_image_filename in (
-        f for f in os.listdir(output_dir) if f.endswith(".png")
-    ):
-        input_image_path = os.path.join(output_dir, card_image_filename)
-        input_image = PIL.Image.open(input_image_path)
-        output_image = PIL.Image.new(
-            input_image.mode,
-            (int(input_image.width * 1.1), int(input_image.height * 1.072)),
+
+def mse_gen_set_archive(
+    filepath: str,
+    *packs: SealedProduct,
+    art_options: ArtOptions = ArtOptions(),
+    workers: int = 1,
+) -> int:
+    slots = mse_set_slots(*packs)
+    faces = [
+        (i, card, printing, face, face_data)
+        for i, (card, printing, n_printing) in enumerate(slots)
+        for face, face_data in mse_slot_faces(card, printing, n_printing)
+    ]
+    art_urls = [
+        url
+        for _, _, printing, _, face_data in faces
+        for url in [card_image_url(printing, face_data)]
+        if url
+    ]
+    cache = get_art_cache()
+    cache.prefetch(art_urls)
+    cache.record_uses(art_urls)
+
+    tasks = [
+        (printing, face, face_data, art_options)
+        for _, _, printing, face, face_data in faces
+    ]
+    cache.save()
+    if workers > 1 and len(tasks) > 1:
+        cache.fetch_missing(art_urls)
+        cache.save()
+        with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=mse_init_worker, initargs=({}, cache.directory)
+        ) as executor:
+            chunksize = max(1, len(tasks) // (workers * 4))
+            art_filepaths = list(
+                executor.map(mse_card_art, *zip(*tasks), chunksize=chunksize)
+            )
+    else:
+        art_filepaths = [mse_card_art(*task) for task in tasks]
+
+    art_filenames: typing.Dict[str, str] = {}
+    image_filenames = []
+    for (i, _, _, face, _), art_filepath in zip(faces, art_filepaths):
+        image_filename = ""
+        if art_filepath is not None:
+            image_filename = art_filenames.setdefault(
+                art_filepath, f"image {i} {face or 0}"
+            )
+        image_filenames.append(image_filename)
+
+    temp_filepath = f"{filepath}.tmp"
+    with zipfile.ZipFile(temp_filepath, "w", zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("set", "w") as set_entry, io.TextIOWrapper(
+            set_entry, encoding="utf-8"
+        ) as set_file:
+            set_file.write(SET_TEMPLATE)
+            for (i, card, printing, face, face_data), image_filename in zip(
+                faces, image_filenames
+            ):
+                if card is None:
+                    text = mse_basic_land_text(i, printing, image_filename)
+                else:
+                    text = mse_card_text(
+                        i, card, printing, face, face_data, image_filename
+                    )
+                set_file.write(text)
+        archive.write(MSE_SET_SYMBOL_FILEPATH, MSE_SET_SYMBOL_FILENAME)
+        for art_filepath, image_filename in art_filenames.items():
+            archive.write(art_filepath, image_filename, zipfile.ZIP_STORED)
+    os.replace(temp_filepath, filepath)
+
+    cache.count_processed()
+    cache.save()
+
+    return sum(os.path.getsize(art_filepath) for art_filepath in art_filenames)
+
+
+class MSEWorkerException(Exception):
+    pass
+
+
+class MSEWorker:
+    mse_path: str
+
+    def __init__(self, mse_path: str = MSE_PATH) -> None:
+        self.mse_path = mse_path
+
+    def export(self, set_dir: str):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MSEExportWorker(MSEWorker):
+    def export(self, set_dir: str):
+        subprocess.run(
+            [
+                self.mse_path,
+                "--export-images",
+                os.path.join(set_dir, "set"),
+                os.path.join(set_dir, IMAGE_FORMAT),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=sys.stdout,
+            stderr=sys.stderr,
+            check=True,
         )
-        output_image.paste("#000000", (0, 0, output_image.width, output_image.height))
-        output_image.paste(
-            input_image,
-            (
-                int((output_image.width - input_image.width) / 2),
-                int((output_image.height - input_image.height) / 2),
-            ),
+
+
+MSE_CLI_TIMEOUT = 60
+MSE_CLI_TIMEOUT_PER_CARD = 10
+
+
+class MSECLIWorker(MSEWorker):
+    process: typing.Union[subprocess.Popen, None]
+    output: "queue.Queue[typing.Union[str, None]]"
+    n_commands: int
+
+    def __init__(self, mse_path: str = MSE_PATH) -> None:
+        super().__init__(mse_path)
+        self.process = None
+        self.n_commands = 0
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [self.mse_path, "--cli", "--quiet", "--raw"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=sys.stderr,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        self.output = queue.Queue()
+
+        def read_output(stdout, output):
+            for line in stdout:
+                output.put(line)
+            output.put(None)
+
+        threading.Thread(
+            target=read_output, args=(self.process.stdout, self.output), daemon=True
+        ).start()
+
+    def run(self, commands: typing.List[str], timeout: float):
+        # MSE doesn't say when a command is done, so have it echo a string after
+        self.n_commands += 1
+        done = f"plh-done-{self.n_commands}"
+        self.process.stdin.write("\n".join(commands + [f'"{done}"']) + "\n")
+        self.process.stdin.flush()
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                line = self.output.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                raise MSEWorkerException(f"MSE took over {timeout}s to export a set")
+            if line is None:
+                raise MSEWorkerException("MSE exited during an export")
+            if done in line:
+                return
+            sys.stdout.write(line)
+
+    def export(self, set_dir: str):
+        set_dir = os.path.abspath(set_dir)
+        _, cards = mse_read_set(set_dir)
+        filenames = [
+            mse_export_filename(mse_card_index(line), n_face)
+            for faces in cards
+            for n_face, line in enumerate(faces)
+        ]
+
+        def mse_string(s: str) -> str:
+            return '"' + s.replace("\\", "/").replace('"', '\\"') + '"'
+
+        commands = [f":load {os.path.join(set_dir, 'set')}"]
+        for n, filename in enumerate(filenames):
+            filepath = mse_string(os.path.join(set_dir, filename))
+            commands.append(f"write_image_file(set.cards[{n}], file: {filepath})")
+        timeout = MSE_CLI_TIMEOUT + MSE_CLI_TIMEOUT_PER_CARD * len(filenames)
+
+        for attempt in range(2):
+            try:
+                if self.process is None or self.process.poll() is not None:
+                    self.start()
+                self.run(commands, timeout)
+                break
+            except (OSError, MSEWorkerException):
+                self.kill()
+                if attempt:
+                    raise
+        missing = [f for f in filenames if not os.path.exists(os.path.join(set_dir, f))]
+        if missing:
+            raise MSEWorkerException(f"MSE didn't export {', '.join(missing)}")
+
+    def close(self):
+        if self.process is not None:
+            try:
+                self.process.stdin.write(":quit\n")
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.kill()
+            self.process = None
+
+    def kill(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+
+idle_mse_workers: typing.Dict[
+    typing.Tuple[typing.Type[MSEWorker], str], typing.List[MSEWorker]
+] = {}
+idle_mse_workers_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def mse_worker(
+    worker_type: typing.Type[MSEWorker] = MSEExportWorker, mse_path: str = MSE_PATH
+) -> typing.Iterator[MSEWorker]:
+    with idle_mse_workers_lock:
+        idle = idle_mse_workers.setdefault((worker_type, mse_path), [])
+        worker = idle.pop() if idle else worker_type(mse_path)
+    try:
+        yield worker
+    except BaseException:
+        worker.close()
+        raise
+    with idle_mse_workers_lock:
+        idle.append(worker)
+
+
+@atexit.register
+def close_mse_workers():
+    with idle_mse_workers_lock:
+        for workers in idle_mse_workers.values():
+            for worker in workers:
+                worker.close()
+        idle_mse_workers.clear()
+
+
+def mse_export_images(
+    set_dir: str,
+    worker_type: typing.Type[MSEWorker] = MSEExportWorker,
+    mse_path: str = MSE_PATH,
+):
+    with mse_worker(worker_type, mse_path) as worker:
+        worker.export(set_dir)
+
+
+def mse_read_set(
+    set_dir: str,
+) -> typing.Tuple[typing.List[str], typing.List[typing.List[str]]]:
+    # both faces of a card are grouped, since MSE has to export them together
+    with open(os.path.join(set_dir, "set"), encoding="utf-8") as set_file:
+        lines = set_file.readlines()
+    header = []
+    entries: typing.List[typing.List[str]] = []
+    for line in lines:
+        if line.startswith("include_file: ") or line == "card:\n":
+            entries.append([line])
+        elif line.startswith("\t") and entries and entries[-1][0] == "card:\n":
+            entries[-1].append(line)
+        else:
+            header.append(line)
+    cards = [
+        list(faces)
+        for _, faces in itertools.groupby(map("".join, entries), key=mse_card_index)
+    ]
+    return header, cards
+
+
+def mse_card_index(entry: str) -> str:
+    if entry.startswith("include_file: "):
+        return entry.split()[2]
+    return re.search(r"^\tindex: (\d+)$", entry, re.MULTILINE).group(1)
+
+
+def mse_card_filenames(
+    entry: str,
+) -> typing.Tuple[typing.Union[str, None], typing.Union[str, None]]:
+    if entry.startswith("include_file: "):
+        card_filename = entry[len("include_file: ") :].strip()
+        return card_filename, "image" + card_filename[len("card") :]
+    match = re.search(r"^\timage: (.+)$", entry, re.MULTILINE)
+    return None, match and match.group(1)
+
+
+def mse_export_filename(index: typing.Union[int, str], n_face: int) -> str:
+    filename = IMAGE_FORMAT.replace("{card.index}", str(index))
+    if n_face:
+        filename = filename.replace(".png", f".{n_face}.png")
+    return filename
+
+
+def mse_write_subset(
+    set_dir: str,
+    subset_dir: str,
+    header: typing.List[str],
+    cards: typing.List[typing.List[str]],
+):
+    os.makedirs(subset_dir)
+    link_file(
+        os.path.join(set_dir, MSE_SET_SYMBOL_FILENAME),
+        os.path.join(subset_dir, MSE_SET_SYMBOL_FILENAME),
+    )
+    with open(os.path.join(subset_dir, "set"), "w", encoding="utf-8") as set_file:
+        set_file.writelines(header)
+        for faces in cards:
+            for line in faces:
+                set_file.write(line)
+                for filename in mse_card_filenames(line):
+                    if filename and os.path.exists(os.path.join(set_dir, filename)):
+                        link_file(
+                            os.path.join(set_dir, filename),
+                            os.path.join(subset_dir, filename),
+                        )
+
+
+def mse_move_images(src_dir: str, dst_dir: str):
+    for filename in os.listdir(src_dir):
+        if filename.endswith(".png"):
+            os.replace(os.path.join(src_dir, filename), os.path.join(dst_dir, filename))
+
+
+MSE_SHARDS_DIRNAME = "shards"
+
+
+def mse_export_set(
+    set_dir: str,
+    shards: int = 1,
+    processes: typing.Union[int, None] = None,
+    mse_path: str = MSE_PATH,
+    worker_type: typing.Type[MSEWorker] = MSEExportWorker,
+):
+    if shards <= 1:
+        mse_export_images(set_dir, worker_type, mse_path)
+        return
+
+    shards_dir = os.path.join(set_dir, MSE_SHARDS_DIRNAME)
+    if os.path.exists(shards_dir):
+        shutil.rmtree(shards_dir)
+    header, cards = mse_read_set(set_dir)
+    if not cards:
+        return
+    shard_size = math.ceil(len(cards) / shards)
+    shard_dirs = []
+    for n in range(0, len(cards), shard_size):
+        shard_dir = os.path.join(shards_dir, f"{len(shard_dirs)}.mse-set")
+        mse_write_subset(set_dir, shard_dir, header, cards[n : n + shard_size])
+        shard_dirs.append(shard_dir)
+    with concurrent.futures.ThreadPoolExecutor(
+        processes or os.cpu_count() or 1
+    ) as executor:
+        exports = [
+            executor.submit(mse_export_images, shard_dir, worker_type, mse_path)
+            for shard_dir in shard_dirs
+        ]
+        for export in exports:
+            export.result()
+    for shard_dir in shard_dirs:
+        mse_move_images(shard_dir, set_dir)
+    shutil.rmtree(shards_dir)
+
+
+RENDER_CACHE_DIR = os.path.join(PLH_HOME, "render_cache")
+RENDER_CACHE_MAX_BYTES = 1 << 30
+
+
+class RenderCache:
+    directory: str
+    max_bytes: float
+    hits: int
+    misses: int
+
+    def __init__(
+        self,
+        directory: str = RENDER_CACHE_DIR,
+        max_bytes: float = RENDER_CACHE_MAX_BYTES,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def filepath(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.png")
+
+    def get(self, key: str, filepath: str) -> bool:
+        try:
+            link_file(self.filepath(key), filepath)
+        except OSError:
+            return False
+        self.touch(key)
+        return True
+
+    def touch(self, key: str):
+        # the file's modified time doubles as when it was last used, for eviction
+        try:
+            os.utime(self.filepath(key))
+        except OSError:
+            pass
+
+    def put(self, key: str, filepath: str):
+        link_file(filepath, self.filepath(key))
+
+    def evict(self):
+        files = []
+        for filename in os.listdir(self.directory):
+            stat = os.stat(os.path.join(self.directory, filename))
+            files.append((stat.st_mtime, stat.st_size, filename))
+        total = sum(size for _, size, _ in files)
+        for _, size, filename in sorted(files):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, filename))
+            total -= size
+
+    def stats(self) -> str:
+        return f"Render cache: {self.hits} hits, {self.misses} misses."
+
+
+render_cache: typing.Union[RenderCache, None] = None
+render_cache_max_bytes: float = RENDER_CACHE_MAX_BYTES
+
+
+def get_render_cache() -> RenderCache:
+    global render_cache
+
+    if render_cache is None:
+        render_cache = RenderCache(max_bytes=render_cache_max_bytes)
+    return render_cache
+
+
+@functools.lru_cache(maxsize=None)
+def mse_stylesheet_digest(mse_path: str) -> str:
+    style_filepath = os.path.join(
+        os.path.dirname(mse_path), "data", "magic-old.mse-style", "style"
+    )
+    try:
+        return file_sha256(style_filepath)
+    except OSError:
+        return ""
+
+
+def mse_render_key(
+    set_dir: str, header: typing.List[str], entry: str, mse_path: str = MSE_PATH
+) -> str:
+    key = hashlib.sha256()
+    key.update(f"{MSE_TEMPLATE_VERSION}\n".encode("utf-8"))
+    key.update(mse_stylesheet_digest(mse_path).encode("utf-8"))
+    key.update("".join(header).encode("utf-8"))
+    card_filename, image_filename = mse_card_filenames(entry)
+    text = entry
+    if card_filename:
+        with open(os.path.join(set_dir, card_filename), encoding="utf-8") as card_file:
+            text = card_file.read()
+    # the index and image filename don't change how a card looks
+    for line in text.splitlines(keepends=True):
+        if not line.startswith(("\tindex: ", "\timage: ", CARD_FILE_HEADER)):
+            key.update(line.encode("utf-8"))
+    if image_filename:
+        try:
+            with open(os.path.join(set_dir, image_filename), "rb") as image_file:
+                key.update(image_file.read())
+        except OSError:
+            pass
+    return key.hexdigest()
+
+
+MSE_RENDER_DIRNAME = "render"
+MSE_PADDED_FILENAME = "padded.json"
+CARD_IMAGE_COMPRESS_LEVEL = 6
+
+
+def mse_pad_image(filepath: str, compress_level: int = CARD_IMAGE_COMPRESS_LEVEL):
+    import PIL.Image
+    import PIL.ImageOps
+
+    with PIL.Image.open(filepath) as image:
+        width = int(image.width * 1.1)
+        height = int(image.height * 1.072)
+        left = int((width - image.width) / 2)
+        top = int((height - image.height) / 2)
+        padded = PIL.ImageOps.expand(
+            image,
+            (left, top, width - image.width - left, height - image.height - top),
+            fill="#000000",
         )
-        output_image.save(input_image_path)
+    # replaced, not rewritten, since it may be linked from the render cache
+    temp_filepath = filepath + ".tmp"
+    padded.save(temp_filepath, format="PNG", compress_level=compress_level)
+    os.replace(temp_filepath, filepath)
+
 
-    return [
-        os.path.join(output_dir, f)
-        for f in os.listdir(output_dir)
-        if f.endswith(".png")
+def mse_padded_signature(
+    filepath: str, key: typing.Union[str, None]
+) -> typing.Union[typing.List[typing.Any], None]:
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns, key]
+
+
+def mse_pad_images(
+    output_dir: str,
+    filepaths: typing.List[str],
+    processes: int = 1,
+    compress_level: int = CARD_IMAGE_COMPRESS_LEVEL,
+    keys: typing.Union[typing.Dict[str, str], None] = None,
+):
+    # what's been padded from which render, so nothing is padded twice
+    padded_filepath = os.path.join(output_dir, MSE_PADDED_FILENAME)
+    padded = read_json_file(padded_filepath) or {}
+    keys = keys or {}
+
+    def signature(filepath: str) -> typing.Union[typing.List[typing.Any], None]:
+        return mse_padded_signature(filepath, keys.get(filepath))
+
+    todo = [
+        filepath
+        for filepath in filepaths
+        if padded.get(os.path.basename(filepath)) != signature(filepath)
     ]
+    if processes > 1 and len(todo) > 1:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            chunksize = max(1, len(todo) // (processes * 4))
+            for _ in executor.map(
+                mse_pad_image,
+                todo,
+                itertools.repeat(compress_level),
+                chunksize=chunksize,
+            ):
+                pass
+    else:
+        for filepath in todo:
+            mse_pad_image(filepath, compress_level)
+    for filepath in todo:
+        padded[os.path.basename(filepath)] = signature(filepath)
+    write_json_file(padded_filepath, padded)
+
+
+def mse_gen_card_images(
+    output_dir: str,
+    shards: int = 1,
+    processes: int = 1,
+    mse_path: str = MSE_PATH,
+    worker_type: typing.Type[MSEWorker] = MSEExportWorker,
+    compress_level: int = CARD_IMAGE_COMPRESS_LEVEL,
+) -> typing.List[str]:
+    cache = get_render_cache()
+    header, cards = mse_read_set(output_dir)
+    padded = read_json_file(os.path.join(output_dir, MSE_PADDED_FILENAME)) or {}
+    keys = {}
+    misses = []
+    for faces in cards:
+        hit = True
+        for n_face, line in enumerate(faces):
+            keys[line] = mse_render_key(output_dir, header, line, mse_path)
+            filename = mse_export_filename(mse_card_index(line), n_face)
+            filepath = os.path.join(output_dir, filename)
+            signature = mse_padded_signature(filepath, keys[line])
+            if signature is not None and padded.get(filename) == signature:
+                cache.touch(keys[line])
+                continue
+            hit = hit and cache.get(keys[line], filepath)
+        if hit:
+            cache.hits += 1
+        else:
+            cache.misses += 1
+            misses.append(faces)
+
+    if len(misses) == len(cards):
+        mse_export_set(output_dir, shards, processes, mse_path, worker_type)
+    elif misses:
+        render_dir = os.path.join(output_dir, MSE_RENDER_DIRNAME)
+        if os.path.exists(render_dir):
+            shutil.rmtree(render_dir)
+        mse_write_subset(output_dir, render_dir, header, misses)
+        mse_export_set(render_dir, shards, processes, mse_path, worker_type)
+        mse_move_images(render_dir, output_dir)
+        shutil.rmtree(render_dir)
+    for faces in misses:
+        for n_face, line in enumerate(faces):
+            filepath = os.path.join(
+                output_dir, mse_export_filename(mse_card_index(line), n_face)
+            )
+            if os.path.exists(filepath):
+                cache.put(keys[line], filepath)
+    cache.evict()
+
+    image_keys = {
+        os.path.join(output_dir, mse_export_filename(mse_card_index(line), n_face)): (
+            keys[line]
+        )
+        for faces in cards
+        for n_face, line in enumerate(faces)
+    }
+    images = [image for image in image_keys if os.path.exists(image)]
+    mse_pad_images(output_dir, images, processes, compress_level, image_keys)
+
+    manifest = read_json_file(os.path.join(output_dir, MSE_MANIFEST_FILENAME))
+    for i, entry in enumerate(manifest["slots"] if manifest else []):
+        if entry and entry.get("same_as") is not None:
+            for n_face in range(len(entry["faces"])):
+                image = os.path.join(output_dir, mse_export_filename(i, n_face))
+                link_file(
+                    os.path.join(
+                        output_dir, mse_export_filename(entry["same_as"], n_face)
+                    ),
+                    image,
+                )
+                images.append(image)
+
+    return sorted(
+        images,
+        key=lambda image: [int(n) for n in os.path.basename(image).split(".")[:-1]],
+    )
 
 
-def mse_gen_card_image_sheets(
-    image_filepaths: typing.List[str], images_per_sheet: int
-) -> typing.Iterable[PIL.Image.Image]:
+def mse_sheet_layout(images_per_sheet: int) -> typing.Tuple[int, int]:
     sq_n = math.sqrt(images_per_sheet)
     for factor in range(int(sq_n), int(sq_n) // 2, -1):
         other_factor = images_per_sheet // factor
@@ -760,31 +2410,288 @@ def mse_gen_card_image_sheets(
     else:
         sheet_rows = int(math.ceil(sq_n))
         sheet_cols = int(math.ceil(sq_n))
+    sheet_rows = max(sheet_rows, math.ceil(images_per_sheet / sheet_cols))
+    return sheet_rows, sheet_cols
+
+
+SHEET_MEMORY_LIMIT = 64 << 20
+
+
+def mse_sheet_bands(
+    image_filepaths: typing.List[str],
+    sheet_rows: int,
+    sheet_cols: int,
+    card_size: typing.Tuple[int, int],
+    mode: str,
+    fill,
+) -> typing.Iterator["PIL.Image.Image"]:
+    import PIL.Image
+
+    card_width, card_height = card_size
+    sheet_width = card_width * sheet_cols
+    n_bands = math.ceil(sheet_width * card_height * len(mode) / SHEET_MEMORY_LIMIT)
+    band_height = math.ceil(card_height / n_bands)
+    for row in range(sheet_rows):
+        row_filepaths = image_filepaths[row * sheet_cols : (row + 1) * sheet_cols]
+        for top in range(0, card_height, band_height):
+            bottom = min(top + band_height, card_height)
+            band = PIL.Image.new(mode, (sheet_width, bottom - top), fill)
+            for col, image_filepath in enumerate(row_filepaths):
+                with PIL.Image.open(image_filepath) as image:
+                    if n_bands > 1:
+                        image = image.crop(
+                            (0, top, image.width, min(bottom, image.height))
+                        )
+                    band.paste(image, (col * card_width, 0))
+            yield band
+
+
+def mse_card_size(image_filepath: str) -> typing.Tuple[int, int]:
+    import PIL.Image
+
+    with PIL.Image.open(image_filepath) as image:
+        return image.size
+
+
+def png_idat(data: bytes) -> bytes:
+    idat = io.BytesIO()
+    pos = 8
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos : pos + 4])
+        if data[pos + 4 : pos + 8] == b"IDAT":
+            idat.write(data[pos + 8 : pos + 8 + length])
+        pos += 12 + length
+    return idat.getvalue()
+
+
+class PNGWriter:
+    file: typing.BinaryIO
+    width: int
+    channels: int
+    compressor: typing.Any
+    last_row: typing.Union["PIL.Image.Image", None]
 
-    card_size = PIL.Image.open(image_filepaths[0]).size
+    def __init__(
+        self,
+        file: typing.BinaryIO,
+        width: int,
+        height: int,
+        mode: str = "RGBA",
+        compress_level: int = CARD_IMAGE_COMPRESS_LEVEL,
+    ) -> None:
+        self.file = file
+        self.width = width
+        self.channels = len(mode)
+        self.compressor = zlib.compressobj(compress_level)
+        self.last_row = None
+        color_type = {"RGB": 2, "RGBA": 6}[mode]
+        self.file.write(b"\x89PNG\r\n\x1a\n")
+        self.chunk(
+            b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+        )
 
-    def make_sheet():
-        return PIL.Image.new(
-            "RGBA", (card_size[0] * sheet_cols, card_size[1] * sheet_rows)
+    def chunk(self, chunk_type: bytes, data: bytes):
+        self.file.write(struct.pack(">I", len(data)))
+        self.file.write(chunk_type)
+        self.file.write(data)
+        self.file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type))))
+
+    def write(self, image: "PIL.Image.Image"):
+        import PIL.Image
+
+        # Pillow picks the filters; the last band's last row goes on top, so the
+        # first row is filtered against it, and is dropped again
+        band = image
+        if self.last_row is not None:
+            band = PIL.Image.new(image.mode, (image.width, image.height + 1))
+            band.paste(self.last_row, (0, 0))
+            band.paste(image, (0, 1))
+        self.last_row = image.crop((0, image.height - 1, image.width, image.height))
+        png = io.BytesIO()
+        band.save(png, "PNG", compress_level=0)
+        scanlines = zlib.decompress(png_idat(png.getvalue()))
+        if band is not image:
+            scanlines = scanlines[1 + self.width * self.channels :]
+        compressed = self.compressor.compress(scanlines)
+        if compressed:
+            self.chunk(b"IDAT", compressed)
+
+    def close(self):
+        self.chunk(b"IDAT", self.compressor.flush())
+        self.chunk(b"IEND", b"")
+
+
+def mse_write_card_image_sheets(
+    image_filepaths: typing.List[str],
+    images_per_sheet: int,
+    output_dir: str,
+    compress_level: int = CARD_IMAGE_COMPRESS_LEVEL,
+) -> typing.List[str]:
+    sheet_rows, sheet_cols = mse_sheet_layout(images_per_sheet)
+    card_size = mse_card_size(image_filepaths[0])
+    sheet_filepaths = []
+    for n in range(0, len(image_filepaths), images_per_sheet):
+        filepaths = image_filepaths[n : n + images_per_sheet]
+        sheet_filepath = os.path.join(output_dir, f"sheet{len(sheet_filepaths)+1}.png")
+        with open(sheet_filepath, "wb") as sheet_file:
+            writer = PNGWriter(
+                sheet_file,
+                card_size[0] * sheet_cols,
+                card_size[1] * sheet_rows,
+                "RGBA",
+                compress_level,
+            )
+            for band in mse_sheet_bands(
+                filepaths, sheet_rows, sheet_cols, card_size, "RGBA", (0, 0, 0, 0)
+            ):
+                writer.write(band)
+            writer.close()
+        sheet_filepaths.append(sheet_filepath)
+    return sheet_filepaths
+
+
+class PDFWriter:
+    file: typing.BinaryIO
+    offsets: typing.Dict[int, int]
+    page_ids: typing.List[int]
+    page: typing.Any
+    compressor: typing.Any
+
+    def __init__(self, file: typing.BinaryIO) -> None:
+        self.file = file
+        # 1 and 2 are the catalog and page tree, written once we know every page
+        self.offsets = {}
+        self.page_ids = []
+        self.page = None
+        self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def begin_object(self) -> int:
+        object_id = max(self.offsets, default=2) + 1
+        self.offsets[object_id] = self.file.tell()
+        self.file.write(f"{object_id} 0 obj\n".encode("ascii"))
+        return object_id
+
+    def write_object(self, body: str, object_id: typing.Union[int, None] = None):
+        if object_id is None:
+            object_id = self.begin_object()
+        else:
+            self.offsets[object_id] = self.file.tell()
+            self.file.write(f"{object_id} 0 obj\n".encode("ascii"))
+        self.file.write(f"{body}\nendobj\n".encode("ascii"))
+        return object_id
+
+    def begin_page(
+        self, width: int, height: int, dpi: float, paper: typing.Tuple[float, float]
+    ):
+        image_id = self.begin_object()
+        # the image's length isn't known until it's compressed, so it goes after
+        length_id = image_id + 1
+        self.file.write(
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode "
+            f"/Length {length_id} 0 R >>\nstream\n".encode("ascii")
         )
+        self.offsets[length_id] = -1
+        self.page = (image_id, length_id, width, height, dpi, paper, self.file.tell())
+        self.compressor = zlib.compressobj()
+
+    def write(self, image: "PIL.Image.Image"):
+        self.file.write(self.compressor.compress(image.convert("RGB").tobytes()))
+
+    def end_page(self):
+        image_id, length_id, width, height, dpi, paper, start = self.page
+        self.file.write(self.compressor.flush())
+        length = self.file.tell() - start
+        self.file.write(b"\nendstream\nendobj\n")
+        self.write_object(str(length), length_id)
+        page_width, page_height = paper
+        image_width = width * 72 / dpi
+        image_height = height * 72 / dpi
+        x = (page_width - image_width) / 2
+        y = (page_height - image_height) / 2
+        contents = (
+            f"q {image_width:.2f} 0 0 {image_height:.2f} {x:.2f} {y:.2f} cm /Im Do Q"
+        )
+        contents_id = self.write_object(
+            f"<< /Length {len(contents)} >>\nstream\n{contents}\nendstream"
+        )
+        self.page_ids.append(
+            self.write_object(
+                f"<< /Type /Page /Parent 2 0 R "
+                f"/MediaBox [0 0 {page_width:.2f} {page_height:.2f}] "
+                f"/Resources << /XObject << /Im {image_id} 0 R >> >> "
+                f"/Contents {contents_id} 0 R >>"
+            )
+        )
+        self.page = None
 
-    sheet_image = make_sheet()
-    n_cards = 0
-    row = 0
-    col = 0
-    for image_filepath in image_filepaths:
-        sheet_image.paste(
-            PIL.Image.open(image_filepath), (col * card_size[0], row * card_size[1])
+    def close(self):
+        self.write_object("<< /Type /Catalog /Pages 2 0 R >>", 1)
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self.write_object(
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>", 2
+        )
+        xref = self.file.tell()
+        n_objects = max(self.offsets) + 1
+        self.file.write(f"xref\n0 {n_objects}\n0000000000 65535 f \n".encode("ascii"))
+        for object_id in range(1, n_objects):
+            self.file.write(f"{self.offsets[object_id]:010} 00000 n \n".encode("ascii"))
+        self.file.write(
+            f"trailer\n<< /Size {n_objects} /Root 1 0 R >>\n"
+            f"startxref\n{xref}\n%%EOF\n".encode("ascii")
         )
-        n_cards += 1
-        col += 1
-        if col >= sheet_cols:
-            row += 1
-            col = 0
-        if n_cards >= images_per_sheet:
-            yield sheet_image
-            sheet_image = make_sheet()
-            n_cards = row = col = 0
+
+
+# in points
+PAPER_SIZES = {"letter": (612.0, 792.0), "a4": (595.28, 841.89)}
+
+
+def mse_pdf_grid(
+    card_size: typing.Tuple[int, int],
+    paper: str = "letter",
+    dpi: float = ART_EXPORT_DPI,
+) -> typing.Tuple[int, int]:
+    page_width, page_height = PAPER_SIZES[paper]
+    return (
+        max(1, int(page_height / (card_size[1] * 72 / dpi))),
+        max(1, int(page_width / (card_size[0] * 72 / dpi))),
+    )
+
+
+def mse_write_card_image_pdf(
+    image_filepaths: typing.List[str],
+    images_per_page: int,
+    filepath: str,
+    dpi: float = ART_EXPORT_DPI,
+    paper: str = "letter",
+) -> int:
+    card_size = mse_card_size(image_filepaths[0])
+    max_rows, max_cols = mse_pdf_grid(card_size, paper, dpi)
+    sheet_cols = min(max_cols, images_per_page)
+    sheet_rows = min(max_rows, math.ceil(images_per_page / sheet_cols))
+    images_per_page = min(images_per_page, sheet_rows * sheet_cols)
+
+    with open(filepath, "wb") as pdf_file:
+        writer = PDFWriter(pdf_file)
+        for n in range(0, len(image_filepaths), images_per_page):
+            writer.begin_page(
+                card_size[0] * sheet_cols,
+                card_size[1] * sheet_rows,
+                dpi,
+                PAPER_SIZES[paper],
+            )
+            for band in mse_sheet_bands(
+                image_filepaths[n : n + images_per_page],
+                sheet_rows,
+                sheet_cols,
+                card_size,
+                "RGB",
+                (255, 255, 255),
+            ):
+                writer.write(band)
+            writer.end_page()
+        writer.close()
+    return images_per_page
 
 
 CARDBACK_FILEPATH = os.path.join(PLH_HOME, "cardback.png")
@@ -828,6 +2735,8 @@ def mpc_gen_orders(
 
 
 def mpc_gen_order(mse_output_dir: str, mpc_output_filepath: str, *packs: SealedProduct):
+    import xml.etree.ElementTree as xml
+
     n_cards = sum(len(pack) for pack in packs)
     if n_cards > MPC_BRACKETS[-1]:
         raise TooManyCardsException(n_cards, MPC_BRACKETS[-1])
@@ -887,6 +2796,8 @@ def mpc_fulfill_order(order_filepath: str):
 
 
 def mpc_merge_orders(orders: typing.Iterable[str], output_filepath: str):
+    import xml.etree.ElementTree as xml
+
     order_xmls = [xml.parse(order) for order in orders]
     order_qtys = [int(o.find("details").find("quantity").text) for o in order_xmls]
     n_cards = sum(order_qtys)
@@ -937,9 +2848,46 @@ def to_decklist(pack: SealedProduct) -> str:
 
 
 class CardNotFoundException(Exception):
-    def __init__(self, name: str) -> None:
-        super().__init__(f"Card not found: {name}")
+    def __init__(self, name: str, suggestions: typing.Sequence[str] = ()) -> None:
+        message = f"Card not found: {name}"
+        if suggestions:
+            message += f" (did you mean {' or '.join(suggestions)}?)"
+        super().__init__(message)
         self.name = name
+        self.suggestions = suggestions
+
+
+CARD_NAME_SUGGESTIONS = 3
+CARD_NAME_MIN_SIMILARITY = 0.4
+
+
+def suggest_card_names(name: str) -> typing.List[str]:
+    trigrams = name_trigrams(card_name_key(name))
+    shared: typing.Dict[str, int] = {}
+    for trigram in trigrams:
+        for key in card_name_trigrams.get(trigram, ()):
+            shared[key] = shared.get(key, 0) + 1
+
+    scores = [
+        (2 * n / (len(trigrams) + len(name_trigrams(key))), key)
+        for key, n in shared.items()
+    ]
+    scores.sort(key=lambda score: -score[0])
+    result: typing.List[str] = []
+    for score, key in scores:
+        if score < CARD_NAME_MIN_SIMILARITY or len(result) >= CARD_NAME_SUGGESTIONS:
+            break
+        suggestion = cards_by_name[key].name()
+        if suggestion not in result:
+            result.append(suggestion)
+    return result
+
+
+def find_card(name: str) -> CardData:
+    card = cards_by_name.get(card_name_key(name))
+    if card is None:
+        raise CardNotFoundException(name, suggest_card_names(name))
+    return card
 
 
 BASIC_LANDS_LOWERCASE = {n.lower(): n for n in BASIC_LANDS}
@@ -962,14 +2910,7 @@ def from_decklist(decklist: str) -> SealedProduct:
             result.basics.setdefault(fixed_card_name, 0)
             result.basics[fixed_card_name] += qty
         else:
-            for _ in range(qty):
-                matches = [
-                    c for c in valid_cards.values() if c.name().lower() == card_name
-                ]
-                if matches:
-                    result.contents.append(matches[0])
-                else:
-                    raise CardNotFoundException(card_name)
+            result.contents.extend([find_card(card_name)] * qty)
     return result
 
 
@@ -1003,22 +2944,119 @@ def main(argv: typing.Union[typing.List[str], None] = None) -> int:
     parser = argparse.ArgumentParser(
         argv[0], description="generates Proxy League cards"
     )
+    parser.add_argument(
+        "--time-startup",
+        action="store_true",
+        help="print how long it takes to get to the main menu, then exit",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="random seed, so the same choices in the menus make the same cards",
+    )
+    parser.add_argument(
+        "--art-cache-size",
+        type=int,
+        default=ART_CACHE_MAX_BYTES >> 20,
+        help="how many MiB of downloaded card art to keep between runs",
+    )
+    parser.add_argument(
+        "--render-cache-size",
+        type=int,
+        default=RENDER_CACHE_MAX_BYTES >> 20,
+        help="how many MiB of card images rendered by MSE to keep between runs",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="how many processes to generate MSE sets and card images with "
+        "(default: one per core)",
+    )
+    parser.add_argument(
+        "--mse-path",
+        default=MSE_PATH,
+        help="Magic Set Editor executable to export card images with",
+    )
+    parser.add_argument(
+        "--mse-cli",
+        action="store_true",
+        help="keep MSE running in --cli mode between exports instead of "
+        "starting it for each one",
+    )
+    parser.add_argument(
+        "--mse-shards",
+        type=int,
+        default=1,
+        help="split sets into this many pieces and export them side by side, "
+        "up to one MSE process per worker",
+    )
+    parser.add_argument(
+        "--mse-inline",
+        action="store_true",
+        help="write every card into the MSE set file, instead of a file per card",
+    )
+    parser.add_argument(
+        "--mse-archive",
+        action="store_true",
+        help="write MSE projects as a single .mse-set file instead of a directory",
+    )
+    parser.add_argument(
+        "--card-image-compress-level",
+        type=int,
+        default=CARD_IMAGE_COMPRESS_LEVEL,
+        help="PNG compression level (0-9) of the exported card images",
+    )
+    parser.add_argument(
+        "--art-dpi",
+        type=int,
+        default=ART_EXPORT_DPI,
+        help="resolution of the card art embedded in the set (default %(default)s)",
+    )
+    parser.add_argument(
+        "--art-format",
+        type=str.upper,
+        choices=ART_FORMATS,
+        default="PNG",
+        help="image format to save card art in",
+    )
+    parser.add_argument(
+        "--art-quality",
+        type=int,
+        help=f"PNG compression level (default {ART_PNG_COMPRESS_LEVEL}) "
+        f"or JPEG quality (default {ART_JPEG_QUALITY}) of card art",
+    )
     args = parser.parse_args(argv[1:])
-    print("Loading card list... ", end="", flush=True)
-    parse_card_list()
-    print("done.")
+    start = time.perf_counter()
+    global art_cache_max_bytes, render_cache_max_bytes
+    art_cache_max_bytes = args.art_cache_size << 20
+    render_cache_max_bytes = args.render_cache_size << 20
+    if args.seed is not None:
+        random.seed(args.seed)
+    load_card_list_in_background()
     show_main_menu(args)
+    if args.time_startup:
+        print(f"Time to first menu: {time.perf_counter() - start:.3f}s")
     return 0
 
 
 def show_main_menu(args: argparse.Namespace):
+    import consolemenu
+
     def redownload_cardlist():
+        # don't pull the card list out from under a load in progress
+        try:
+            wait_for_card_list()
+        except Exception:
+            pass
         print("Downloading card list... ", end="", flush=True)
-        download_card_list()
-        print("done.")
-        print("Reloading card list... ", end="", flush=True)
-        parse_card_list()
+        if not download_card_list():
+            print("already up to date.")
+            input("(press ENTER to continue)")
+            return
         print("done.")
+        load_card_list_in_background()
+        wait_for_card_list()
         print("Card list updated successfully.")
         input("(press ENTER to continue)")
 
@@ -1029,10 +3067,15 @@ def show_main_menu(args: argparse.Namespace):
     menu.append_item(
         consolemenu.items.FunctionItem("Re-download card list", redownload_cardlist)
     )
+    if args.time_startup:
+        return
     menu.show()
 
 
 def show_pack_menu(args: argparse.Namespace):
+    import consolemenu
+
+    wait_for_card_list()
     generating = ""
     packs: typing.List[SealedProduct] = []
 
@@ -1044,8 +3087,7 @@ def show_pack_menu(args: argparse.Namespace):
         except Exception:
             return
         generating += f"{', ' if generating else ''}{n} packs"
-        for _ in range(n):
-            packs.append(make_pack())
+        packs.extend(make_packs(n, args.seed, stream=len(packs)))
 
     def add_deck():
         nonlocal generating, packs
@@ -1097,6 +3139,8 @@ def show_pack_menu(args: argparse.Namespace):
 
 
 def show_packs_output_menu(args: argparse.Namespace, packs: typing.List[SealedProduct]):
+    import consolemenu
+
     def decklist_console():
         for pack in packs:
             print(to_decklist(pack))
@@ -1112,21 +3156,53 @@ def show_packs_output_menu(args: argparse.Namespace, packs: typing.List[SealedPr
         print("Decklist written.")
         input("(press ENTER to continue)")
 
+    def gen_set(path: str, archive: bool = False):
+        art_options = ArtOptions(args.art_dpi, args.art_format, args.art_quality)
+        if archive:
+            art_bytes = mse_gen_set_archive(
+                path, *packs, art_options=art_options, workers=args.workers
+            )
+        else:
+            art_bytes = mse_gen_set(
+                path,
+                *packs,
+                art_options=art_options,
+                workers=args.workers,
+                inline=args.mse_inline,
+            )
+        n_cards = sum(len(p) for p in packs)
+        print("MSE set generated.")
+        print(get_art_cache().stats())
+        print(f"Card art: {art_bytes // max(n_cards, 1)} bytes per card.")
+
+    def gen_images(path: str) -> typing.List[str]:
+        images = mse_gen_card_images(
+            path,
+            shards=args.mse_shards,
+            processes=args.workers,
+            mse_path=args.mse_path,
+            worker_type=MSECLIWorker if args.mse_cli else MSEExportWorker,
+            compress_level=args.card_image_compress_level,
+        )
+        print(get_render_cache().stats())
+        return images
+
     def mse():
-        path = input("What is the path to where you want the MSE set directory? ")
+        if args.mse_archive:
+            path = input("What is the path to where you want the MSE set file? ")
+        else:
+            path = input("What is the path to where you want the MSE set directory? ")
         if not path:
             return
-        mse_gen_set(path, *packs)
-        print("MSE set generated.")
+        gen_set(path, archive=args.mse_archive)
         input("(press ENTER to continue)")
 
     def images():
         path = input("What is the path to where you want the MSE set directory? ")
         if not path:
             return
-        mse_gen_set(path, *packs)
-        print("MSE set generated.")
-        mse_gen_card_images(path)
+        gen_set(path)
+        gen_images(path)
         print("Images generated into MSE set directory.")
         input("(press ENTER to continue)")
 
@@ -1147,24 +3223,58 @@ def show_packs_output_menu(args: argparse.Namespace, packs: typing.List[SealedPr
                     ips = int(ips_str)
                 except Exception:
                     pass
-        mse_gen_set(path, *packs)
-        print("MSE set generated.")
-        images = mse_gen_card_images(path)
+        gen_set(path)
+        images = gen_images(path)
         print("Images generated into MSE set directory.")
-        for i, image in enumerate(mse_gen_card_image_sheets(images, ips)):
-            image.save(os.path.join(path, f"sheet{i+1}.png"))
+        mse_write_card_image_sheets(
+            images, ips, path, compress_level=args.card_image_compress_level
+        )
         for image in images:
             os.remove(image)
         print("Image sheets generated into MSE set directory.")
         input("(press ENTER to continue)")
 
+    def images_pdf():
+        path = input("What is the path to where you want the MSE set directory? ")
+        if not path:
+            return
+        paper: str = None
+        while paper is None:
+            paper_str = input("What paper size? (letter or a4, default is letter) ")
+            if not paper_str:
+                paper = "letter"
+            elif paper_str.lower() in PAPER_SIZES:
+                paper = paper_str.lower()
+        gen_set(path)
+        images = gen_images(path)
+        print("Images generated into MSE set directory.")
+        rows, cols = mse_pdf_grid(mse_card_size(images[0]), paper)
+        ipp: int = None
+        while ipp is None:
+            ipp_str = input(
+                f"How many images do you want per page? (default is {rows * cols}) "
+            )
+            if not ipp_str:
+                ipp = rows * cols
+            else:
+                try:
+                    ipp = int(ipp_str)
+                except Exception:
+                    pass
+        ipp_used = mse_write_card_image_pdf(
+            images, ipp, os.path.join(path, "cards.pdf"), paper=paper
+        )
+        if ipp_used < ipp:
+            print(f"Only {ipp_used} cards fit on a {paper} page at full size.")
+        print("Printable PDF generated into MSE set directory.")
+        input("(press ENTER to continue)")
+
     def mpc():
         path = input("What is the path to where you want the MSE set directory? ")
         if not path:
             return
-        mse_gen_set(path, *packs)
-        print("MSE set generated.")
-        mse_gen_card_images(path)
+        gen_set(path)
+        gen_images(path)
         print("Images generated into MSE set directory.")
         mpc_gen_orders(path, *packs)
         print("MPC order XMLs generated into MSE set directory.")
@@ -1177,9 +3287,8 @@ def show_packs_output_menu(args: argparse.Namespace, packs: typing.List[SealedPr
         path = input("What is the path to where you want the MSE set directory? ")
         if not path:
             return
-        mse_gen_set(path, *packs)
-        print("MSE set generated.")
-        mse_gen_card_images(path)
+        gen_set(path)
+        gen_images(path)
         print("Images generated into MSE set directory.")
         orders = mpc_gen_orders(path, *packs)
         print("MPC order XMLs generated into MSE set directory.")
@@ -1212,6 +3321,9 @@ def show_packs_output_menu(args: argparse.Namespace, packs: typing.List[SealedPr
             "MSE project + card images (sheets)", images_sheets
         )
     )
+    menu.append_item(
+        consolemenu.items.FunctionItem("MSE project + printable PDF", images_pdf)
+    )
     menu.append_item(
         consolemenu.items.FunctionItem(
             "MSE project + images + MakePlayingCards order", mpc
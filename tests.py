@@ -1,7 +1,84 @@
-import os
-
 import proxy_league_helper as plh
 
+# padded card images at 300 dpi print 3x2 to a letter page and 3x3 to an A4 one
+assert plh.mse_pdf_grid((825, 1121), "letter") == (2, 3)
+assert plh.mse_pdf_grid((825, 1121), "a4") == (3, 3)
+
+# pinned MSE markup for the trickier symbols and rules text
+assert plh.mse_format_mana_cost("{10}{G}{G}") == "[10]GG"
+assert plh.mse_format_mana_cost("{15}") == "[15]"
+assert plh.mse_format_mana_cost("{G/W/P}{G/W/P}") == "H/G/WH/G/W"
+assert plh.mse_format_mana_cost("{W/P}") == "H/W"
+assert plh.mse_format_mana_cost("{2/W}{X}") == "2/WX"
+assert plh.mse_format_mana_cost("{TK}{TK}") == "DD"
+assert plh.mse_rules_markup(
+    "{W/P}, Pay 2 life: Regenerate target creature. "
+    "({W/P} can be paid with either {W} or 2 life.)",
+    False,
+    False,
+) == (
+    "<kw-0><sym>H/W</sym>, Pay 2 life: Regenerate target creature. "
+    "<i>(<sym>H/W</sym> can be paid with either <sym>W</sym> or 2 life.)</i></kw-0>"
+)
+assert plh.mse_rules_markup(
+    "({G/U/P} can be paid with either {G}, {U}, or 2 life.)\n{P}: Proliferate.",
+    False,
+    False,
+) == (
+    "<kw-0><i>(<sym>H/G/U</sym> can be paid with either <sym>G</sym>, <sym>U</sym>, "
+    "or 2 life.)</i>\n\t\t<sym>H</sym>: Proliferate.</kw-0>"
+)
+assert plh.mse_rules_markup(
+    "{TK}{TK} — Put a sticker on a nonland permanent you own.", False, False
+) == (
+    "<kw-0><sym>D</sym><sym>D</sym> — "
+    "Put a sticker on a nonland permanent you own.</kw-0>"
+)
+assert (
+    plh.mse_rules_markup(
+        "Whenever chaos ensues, {CHAOS}: untap all creatures.", False, False
+    )
+    == "<kw-0>Whenever chaos ensues, <sym>A</sym>: untap all creatures.</kw-0>"
+)
+assert plh.mse_rules_markup("{10}, {T}: Draw a card.", False, False) == (
+    "<kw-0><sym>[10]</sym>, <sym>T</sym>: Draw a card.</kw-0>"
+)
+assert plh.mse_rules_markup(
+    "+2: Each player draws a card.\n−1: Target player draws a card.\n"
+    "−10: Target player mills twenty cards.",
+    True,
+    False,
+) == (
+    "<kw-0><sym>+2</sym>: Each player draws a card.\n\t\t"
+    "<sym>-1</sym>: Target player draws a card.\n\t\t"
+    "<sym>-10</sym>: Target player mills twenty cards.</kw-0>"
+)
+assert plh.mse_rules_markup(
+    "+1: Scry 1.\n0: Untap target permanent.\n"
+    "−X: Exile target creature with mana value X.",
+    True,
+    False,
+) == (
+    "<kw-0><sym>+1</sym>: Scry 1.\n\t\t<sym>+0</sym>: Untap target permanent.\n\t\t"
+    "<sym>-X</sym>: Exile target creature with mana value X.</kw-0>"
+)
+assert plh.mse_rules_markup(
+    "(As this Saga enters and after your draw step, add a lore counter. "
+    "Sacrifice after III.)\n"
+    "I, II — Create a 2/2 white Knight creature token with vigilance.\n"
+    "III — If you control a Knight, put a +1/+1 counter on it.",
+    False,
+    True,
+) == (
+    "<kw-0><i>(As this Saga enters and after your draw step, add a lore counter. "
+    "Sacrifice after <no-sym>III</no-sym>.)</i>\n\t\t"
+    "<no-sym>I</no-sym>, <no-sym>II</no-sym> — "
+    "Create a 2/2 white Knight creature token with vigilance.\n\t\t"
+    "<no-sym>III</no-sym> — <no-sym>I</no-sym>f you control a Knight, "
+    "put a +1/+1 counter on it.</kw-0>"
+)
+assert plh.mse_rules_markup("", True, True) == ""
+
 plh.parse_card_list()
 
 print(f"Valid cards: {len(plh.valid_cards)}")
@@ -11,7 +88,7 @@ last_bracket = 0
 for i, bracket in enumerate(plh.BRACKETS):
     n_in_bracket = 0
     for card in plh.valid_cards.values():
-        price = min(card.prices)
+        price = card.price
         if price > last_bracket and price <= bracket:
             n_in_bracket += 1
     print(
@@ -51,7 +128,6 @@ output_dir = "IPL.mse-set"
 output_pack = plh.make_pack()
 plh.mse_gen_set(output_dir, output_pack)
 images = plh.mse_gen_card_images(output_dir)
-for i, image in enumerate(plh.mse_gen_card_image_sheets(images, len(output_pack))):
-    image.save(os.path.join(output_dir, f"sheet{i+1}.png"))
+plh.mse_write_card_image_sheets(images, len(output_pack), output_dir)
 plh.mpc_gen_order(output_dir, plh.MPC_XML_FILENAME, output_pack)
 # mpc_fulfill_order(plh.MPC_XML_FILENAME)